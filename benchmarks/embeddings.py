@@ -0,0 +1,82 @@
+"""So sanh backend embedding torch va onnx: do lech cosine, latency embed_query va RSS.
+
+    python -m benchmarks.embeddings --backends torch onnx onnx-int8
+
+Moi backend chay trong mot process rieng de RSS khong bi cong don.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+
+SAMPLE_TEXTS = [
+    "First Cloud Journey la gi?",
+    "Lam sao de tao EC2 instance tren AWS?",
+    "Quy dinh ve gio lam viec cua chuong trinh FCJ",
+    "S3 bucket policy khac IAM policy nhu the nao?",
+    "Huong dan deploy ung dung len EKS bang kubectl",
+    "Who is the mentor of the AWS workshop?",
+    "CloudWatch alarm gui thong bao qua SNS",
+    "Cach tinh chi phi Lambda theo so lan goi va thoi gian chay",
+]
+
+def run_backend(name: str, texts, n_queries: int):
+    from src.config import settings
+    from src.services.embeddings import get_embeddings
+
+    settings.ONNX_QUANTIZE = name == "onnx-int8"
+    start = time.perf_counter()
+    embeddings = get_embeddings(backend="onnx" if name.startswith("onnx") else name)
+    embeddings.embed_query("warm up")
+    load_time = time.perf_counter() - start
+
+    latencies = []
+    for i in range(n_queries):
+        start = time.perf_counter()
+        embeddings.embed_query(texts[i % len(texts)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    batch_time = (time.perf_counter() - start) * 1000
+
+    # ru_maxrss tinh bang KB tren Linux
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "load_s": load_time,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "batch_ms": batch_time,
+        "rss_mb": rss_mb,
+        "vectors": vectors,
+    }
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+def run(backends, n_queries: int):
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name in backends:
+        with ctx.Pool(1) as pool:
+            results[name] = pool.apply(run_backend, (name, SAMPLE_TEXTS, n_queries))
+
+    baseline = results[backends[0]]["vectors"]
+    header = f"{'backend':>10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'batch ms':>9} {'RSS MB':>7} {'cos min':>8} {'cos mean':>9}"
+    print(f"{n_queries} queries, batch {len(SAMPLE_TEXTS)} texts, cosine so voi {backends[0]}\n")
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        sims = cosine(baseline, r["vectors"])
+        print(
+            f"{name:>10} {r['load_s']:>7.2f} {r['p50']:>7.2f} {r['p95']:>7.2f} {r['batch_ms']:>9.1f}"
+            f" {r['rss_mb']:>7.0f} {sims.min():>8.4f} {sims.mean():>9.4f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity va latency/RSS cua cac backend embedding")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    run(args.backends, args.queries)
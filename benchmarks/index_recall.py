@@ -0,0 +1,104 @@
+"""So sanh recall@k, latency va dung luong cac loai index FAISS voi index flat.
+
+Chay sau khi da co vectorstore:
+
+    python -m benchmarks.index_recall --k 5 --queries 200
+
+hoac voi vector ngau nhien, khong can vectorstore:
+
+    python -m benchmarks.index_recall --synthetic 20000
+"""
+import argparse
+import os
+import time
+
+import faiss
+import numpy as np
+
+from src.config import settings
+from src.services.shards import list_shards, shard_path
+from src.services.vector_index import (
+    INDEX_TYPES,
+    STORAGE_TYPES,
+    apply_search_params,
+    build_index,
+    min_train_size,
+)
+from src.services.versions import active_path
+
+def load_vectors(synthetic: int, dim: int = 384):
+    if synthetic:
+        rng = np.random.default_rng(0)
+        return rng.standard_normal((synthetic, dim)).astype("float32")
+    # Doc index.faiss (flat) cua version dang chay, vectorstore chia shard thi gop tat ca shard
+    path = active_path()
+    shards = list_shards(path)
+    paths = [shard_path(path, shard) for shard in shards] if shards is not None else [path]
+    parts = []
+    for shard_dir in paths:
+        index = faiss.read_index(os.path.join(shard_dir, "index.faiss"))
+        parts.append(index.reconstruct_n(0, index.ntotal))
+    return np.concatenate(parts)
+
+def make_queries(vectors: np.ndarray, n: int):
+    # Query = vector co san + nhieu, gan giong cau hoi sat voi mot chunk trong corpus
+    rng = np.random.default_rng(1)
+    picks = vectors[rng.integers(0, len(vectors), n)]
+    noise = rng.standard_normal(picks.shape).astype("float32") * vectors.std() * 0.5
+    return picks + noise
+
+def measure(index, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return np.array(results), np.array(latencies)
+
+def recall_at_k(results: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return hits / (len(truth) * k)
+
+def run(k: int, n_queries: int, synthetic: int, index_types, storages):
+    vectors = load_vectors(synthetic)
+    queries = make_queries(vectors, n_queries)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} chieu, {n_queries} queries, k={k}\n")
+
+    baseline = build_index(vectors, "flat", "float32")
+    truth, _ = measure(baseline, queries, k)
+
+    header = f"{'index':<10} {'storage':<8} {'recall@k':>8} {'p50 ms':>8} {'p95 ms':>8} {'MB':>8} {'build s':>8}"
+    print(header)
+    print("-" * len(header))
+    for index_type in index_types:
+        for storage in storages:
+            # PQ tu nen vector, khong ket hop voi float16/sq8
+            if index_type == "ivf_pq" and storage != "float32":
+                continue
+            if len(vectors) < min_train_size(index_type):
+                print(f"{index_type:<10} {storage:<8} bo qua: can >= {min_train_size(index_type)} vectors")
+                continue
+
+            start = time.perf_counter()
+            index = apply_search_params(build_index(vectors, index_type, storage))
+            build_time = time.perf_counter() - start
+            size_mb = len(faiss.serialize_index(index)) / 1024 / 1024
+
+            results, latencies = measure(index, queries, k)
+            print(
+                f"{index_type:<10} {storage:<8} {recall_at_k(results, truth):>8.3f} "
+                f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 95):>8.3f} "
+                f"{size_mb:>8.2f} {build_time:>8.2f}"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k va latency cua cac loai index so voi flat")
+    parser.add_argument("--k", type=int, default=settings.SEARCH_K)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, default=0, help="Dung N vector ngau nhien thay vi vectorstore")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--storage", nargs="+", default=list(STORAGE_TYPES), choices=STORAGE_TYPES)
+    args = parser.parse_args()
+    run(args.k, args.queries, args.synthetic, args.types, args.storage)
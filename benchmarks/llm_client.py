@@ -0,0 +1,64 @@
+"""Do tail latency cua LLMClient tren stub server, co va khong co hedging.
+
+    python -m benchmarks.llm_client --requests 200 --concurrency 8 --tail-prob 0.05 --error-rate 0.02
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.stub_llm import StubConfig, start_in_thread
+from src.services.llm_client import LLMClient, LLMError
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "FCAJ là gì?"}]}
+
+def one_request(client: LLMClient):
+    start = time.perf_counter()
+    ttft = None
+    try:
+        for _ in client.stream(PAYLOAD):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+    except LLMError:
+        return None
+    return ttft, time.perf_counter() - start
+
+def run_case(name: str, base_url: str, hedge: bool, n: int, concurrency: int, hedge_min_delay: float):
+    client = LLMClient(base_url, api_key="stub", hedge=hedge, hedge_min_delay=hedge_min_delay, backoff=0.05)
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(client), range(n)))
+    ok = [r for r in results if r is not None]
+    ttfts = np.array([r[0] for r in ok]) * 1000
+    totals = np.array([r[1] for r in ok]) * 1000
+    stats = client.stats()
+    print(
+        f"{name:>10} {np.percentile(ttfts, 50):>8.0f} {np.percentile(ttfts, 95):>8.0f} {np.percentile(ttfts, 99):>8.0f}"
+        f" {np.percentile(totals, 99):>9.0f} {len(results) - len(ok):>6} {stats['retries']:>7} {stats['hedges']:>6} {stats['hedge_wins']:>5}"
+    )
+
+def run(n: int, concurrency: int, config: StubConfig, hedge_min_delay: float):
+    base_url, server = start_in_thread(config)
+    print(f"{n} requests, concurrency {concurrency}, stub ttft {config.ttft}s, "
+          f"{config.tail_prob:.0%} cham {config.tail_ttft}s, loi {config.error_rate:.0%}\n")
+    header = f"{'':>10} {'ttft p50':>8} {'p95':>8} {'p99':>8} {'total p99':>9} {'fail':>6} {'retries':>7} {'hedges':>6} {'wins':>5}"
+    print(header)
+    print("-" * len(header))
+    run_case("no hedge", base_url, False, n, concurrency, hedge_min_delay)
+    run_case("hedge", base_url, True, n, concurrency, hedge_min_delay)
+    server.should_exit = True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tail latency cua LLMClient voi stub server")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--tail-ttft", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--hedge-min-delay", type=float, default=0.3)
+    args = parser.parse_args()
+    config = StubConfig(ttft=args.ttft, tail_prob=args.tail_prob, tail_ttft=args.tail_ttft,
+                        tokens=args.tokens, error_rate=args.error_rate)
+    run(args.requests, args.concurrency, config, args.hedge_min_delay)
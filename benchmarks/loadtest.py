@@ -0,0 +1,367 @@
+"""Load test nhieu session chat dong thoi de tim diem bao hoa cua mot pod.
+
+    # Tu chay stub LLM + API (uvicorn src.api:app) tren vectorstore hien tai
+    python -m benchmarks.loadtest --levels 1 4 8 16 32 --duration 60 --think 5
+
+    # Khong can vectorstore/model: corpus sinh ngau nhien + embedding "hash"
+    python -m benchmarks.loadtest --synthetic --levels 1 4 8 16
+
+    # Ban vao API da deploy (pod tro LLM_BASE_URL toi stub: make stub-llm), doc CPU/RSS tung pod
+    python -m benchmarks.loadtest --url http://chatbot-api:8000 \\
+        --metrics http://10.0.1.12:9100/metrics http://10.0.1.13:9100/metrics
+
+Moi session hoi lan luot cac cau trong --questions (jsonl co truong question/title,
+hoac moi dong mot cau), gui kem lich su hoi thoai, nghi ngau nhien (phan phoi mu,
+trung binh --think giay) giua hai cau hoi. Session di qua /chat/stream, cung
+stream_answer ma Streamlit goi. Voi moi muc concurrency in throughput, latency
+p50/p95/p99, TTFT, ti le bi tu choi (503) va CPU/RSS cua tung pod doc tu /metrics.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+import httpx
+import numpy as np
+
+from benchmarks.stub_llm import StubConfig, free_port, start_in_thread
+from benchmarks.suite import QUESTIONS, make_corpus
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@dataclass
+class Result:
+    start: float
+    total: float
+    ttft: float = None
+    status: str = "ok"  # ok | rejected | error
+
+def load_questions(path: str):
+    if not path:
+        return list(QUESTIONS)
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                row = json.loads(line)
+                line = row.get("question") or row.get("title") or row.get("body") or ""
+            if line:
+                questions.append(line)
+    if not questions:
+        raise SystemExit(f"Khong co cau hoi nao trong {path}")
+    return questions
+
+def ask(client: httpx.Client, url: str, question: str, history) -> tuple:
+    """Gui mot cau hoi qua /chat/stream; tra ve (Result, cau tra loi)."""
+    start = time.perf_counter()
+    result = Result(start=start, total=0)
+    chunks = []
+    try:
+        with client.stream("POST", f"{url}/chat/stream", json={"question": question, "history": history}) as response:
+            if response.status_code == 503:
+                result.status = "rejected"
+            elif response.status_code != 200:
+                result.status = "error"
+            else:
+                event = None
+                for line in response.iter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[5:])
+                        if event == "error":
+                            result.status = "error"
+                        elif "token" in data:
+                            if result.ttft is None:
+                                result.ttft = time.perf_counter() - start
+                            chunks.append(data["token"])
+                        event = None
+    except httpx.HTTPError:
+        result.status = "error"
+    result.total = time.perf_counter() - start
+    return result, "".join(chunks)
+
+def run_session(client, url, questions, deadline, think, max_turns, rng, results, lock):
+    # Bat dau lech nhau nhu nguoi dung vao trang vao cac thoi diem khac nhau
+    time.sleep(rng.uniform(0, min(think, 2.0)) if think else 0)
+    history = []
+    position = rng.randrange(len(questions))
+    while time.monotonic() < deadline:
+        question = questions[position % len(questions)]
+        position += 1
+        result, answer = ask(client, url, question, history)
+        with lock:
+            results.append(result)
+        if result.status == "ok":
+            history = (history + [
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            ])[-2 * max_turns:]
+        if think:
+            time.sleep(max(0.0, min(rng.expovariate(1 / think), deadline - time.monotonic())))
+
+def scrape(url: str) -> dict:
+    text = httpx.get(url, timeout=5).text
+    values = {}
+    for name in ("process_cpu_seconds_total", "process_resident_memory_bytes"):
+        match = re.search(rf"^{name} (\S+)$", text, re.MULTILINE)
+        if match:
+            values[name] = float(match.group(1))
+    return values
+
+class PodSampler:
+    """Doc CPU (giay) va RSS cua tung pod moi giay trong mot muc concurrency."""
+
+    def __init__(self, urls, interval: float = 1.0):
+        self.urls = urls
+        self.interval = interval
+        self._stop = threading.Event()
+        self._first, self._last, self._max_rss = {}, {}, {}
+
+    def _sample(self):
+        now = time.monotonic()
+        for url in self.urls:
+            try:
+                values = scrape(url)
+            except httpx.HTTPError:
+                continue
+            sample = (now, values.get("process_cpu_seconds_total", 0.0))
+            self._first.setdefault(url, sample)
+            self._last[url] = sample
+            rss = values.get("process_resident_memory_bytes", 0.0)
+            self._max_rss[url] = max(self._max_rss.get(url, 0.0), rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="pod-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def stats(self) -> dict:
+        pods = {}
+        for url, (start, cpu_start) in self._first.items():
+            end, cpu_end = self._last[url]
+            pods[url] = {
+                "cpu_cores": (cpu_end - cpu_start) / (end - start) if end > start else 0.0,
+                "max_rss_mb": self._max_rss[url] / 1024 / 1024,
+            }
+        return pods
+
+def run_level(url, sessions, duration, questions, think, max_turns, metrics_urls, seed):
+    results, lock = [], threading.Lock()
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    with httpx.Client(timeout=httpx.Timeout(120, connect=10), limits=limits) as client, \
+            PodSampler(metrics_urls) as sampler:
+        start = time.monotonic()
+        threads = [
+            threading.Thread(
+                target=run_session,
+                args=(client, url, questions, deadline, think, max_turns, random.Random(seed + i), results, lock),
+                daemon=True,
+            )
+            for i in range(sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        # Cho cac cau hoi dang do xong, khong cat ngang o deadline
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+    return summarize(sessions, results, elapsed, sampler.stats())
+
+def summarize(sessions: int, results, elapsed: float, pods: dict) -> dict:
+    ok = [r for r in results if r.status == "ok"]
+    totals = np.array([r.total for r in ok]) * 1000
+    ttfts = np.array([r.ttft for r in ok if r.ttft is not None]) * 1000
+
+    def pct(values, q):
+        return float(np.percentile(values, q)) if len(values) else None
+
+    return {
+        "sessions": sessions,
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(r.status == "rejected" for r in results),
+        "errors": sum(r.status == "error" for r in results),
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_ms": {"p50": pct(totals, 50), "p95": pct(totals, 95), "p99": pct(totals, 99)},
+        "ttft_ms": {"p50": pct(ttfts, 50), "p95": pct(ttfts, 95), "p99": pct(ttfts, 99)},
+        "pods": pods,
+    }
+
+def find_saturation(levels, slo_ms: float = None):
+    """Muc concurrency cuoi cung con tang throughput >= 10%, khong loi/tu choi qua 1% va dat SLO p95."""
+    best = None
+    for previous, level in zip([None] + levels[:-1], levels):
+        failed = (level["rejected"] + level["errors"]) / max(level["requests"], 1)
+        p95 = level["latency_ms"]["p95"]
+        if failed > 0.01 or (slo_ms and p95 is not None and p95 > slo_ms):
+            break
+        if previous is not None and level["throughput_rps"] < 1.1 * previous["throughput_rps"]:
+            break
+        best = level
+    return best
+
+def fmt(value) -> str:
+    return f"{value:.0f}" if value is not None else "-"
+
+def print_level(level: dict):
+    pods = level["pods"].values()
+    cpu = sum(p["cpu_cores"] for p in pods)
+    rss = max((p["max_rss_mb"] for p in pods), default=0.0)
+    print(
+        f"{level['sessions']:>8} {level['throughput_rps']:>7.2f} {fmt(level['latency_ms']['p50']):>7}"
+        f" {fmt(level['latency_ms']['p95']):>7} {fmt(level['latency_ms']['p99']):>7}"
+        f" {fmt(level['ttft_ms']['p50']):>8} {fmt(level['ttft_ms']['p95']):>8}"
+        f" {level['rejected']:>6} {level['errors']:>6} {cpu:>6.2f} {rss:>7.0f}",
+        flush=True,
+    )
+    if len(level["pods"]) > 1:
+        for url, pod in level["pods"].items():
+            print(f"{'':>8} {url}: cpu {pod['cpu_cores']:.2f} cores, rss {pod['max_rss_mb']:.0f} MB")
+
+def wait_ready(url: str, process, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"API dung voi exit code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"API chua ready sau {timeout:.0f}s")
+
+def build_synthetic(workdir: str, env: dict, docs: int):
+    make_corpus(os.path.join(workdir, "data"), docs, 600)
+    subprocess.run([sys.executable, "-m", "src.process_docs", "--full"], cwd=workdir, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+def start_api(args, llm_url: str):
+    """Chay uvicorn src.api:app trong process rieng (giong mot pod); tra ve (url, process, workdir)."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "LLM_BASE_URL": llm_url,
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "stub"),
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+        "MAX_IN_FLIGHT": str(args.max_in_flight),
+        "METRICS_PORT": "0",
+        "INDEX_RELOAD_INTERVAL": "0",
+    }
+    workdir, cwd = None, os.getcwd()
+    if args.synthetic:
+        workdir = cwd = tempfile.mkdtemp(prefix="rag-loadtest-")
+        env["EMBEDDING_BACKEND"] = "hash"
+        build_synthetic(workdir, env, args.docs)
+
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    wait_ready(url, process)
+    return url, process, workdir
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test nhieu session dong thoi voi stub LLM")
+    parser.add_argument("--url", help="API da chay san (mac dinh: tu chay src.api voi stub LLM)")
+    parser.add_argument("--metrics", nargs="*", help="URL /metrics cua tung pod de doc CPU/RSS")
+    parser.add_argument("--questions", help="File cau hoi: jsonl (question/title) hoac moi dong mot cau")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=30, help="Giay cho moi muc concurrency")
+    parser.add_argument("--think", type=float, default=3, help="Thoi gian nghi trung binh giua hai cau (giay)")
+    parser.add_argument("--max-turns", type=int, default=3, help="So luot hoi thoai gui kem moi cau hoi")
+    parser.add_argument("--slo", type=float, help="p95 latency toi da (ms) khi tim diem bao hoa")
+    parser.add_argument("--out", help="Ghi ket qua JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    stub = parser.add_argument_group("stub LLM")
+    stub.add_argument("--llm-ttft", type=float, default=0.3, help="Giay toi token dau tien")
+    stub.add_argument("--llm-token-rate", type=float, default=100, help="Token/giay khi stream")
+    stub.add_argument("--llm-tokens", type=int, default=150, help="So token moi cau tra loi")
+    stub.add_argument("--stub-port", type=int, help="Port cho stub khi ban vao API da deploy (--url)")
+    local = parser.add_argument_group("API chay local")
+    local.add_argument("--synthetic", action="store_true", help="Dung corpus sinh ngau nhien, khong can vectorstore")
+    local.add_argument("--docs", type=int, default=200, help="So tai lieu khi --synthetic")
+    local.add_argument("--max-in-flight", type=int, default=8)
+    local.add_argument("--answer-cache", action="store_true", help="Bat cache cau tra loi (mac dinh tat)")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        ttft=args.llm_ttft, tail_prob=0, token_delay=1 / args.llm_token_rate, tokens=args.llm_tokens,
+    )
+    llm_url, stub_server = start_in_thread(config, args.stub_port)
+    process = workdir = None
+    url = args.url.rstrip("/") if args.url else None
+    if url is None:
+        url, process, workdir = start_api(args, llm_url)
+        print(f"API local {url}, stub LLM {llm_url}")
+    else:
+        print(f"API {url}; pod can tro LLM_BASE_URL toi stub {llm_url} (hoac make stub-llm)")
+    metrics_urls = args.metrics if args.metrics is not None else [f"{url}/metrics"]
+    questions = load_questions(args.questions)
+
+    print(f"{len(questions)} cau hoi, {args.duration:.0f}s moi muc, think {args.think}s, "
+          f"LLM ttft {args.llm_ttft}s, {args.llm_token_rate:.0f} token/s x {args.llm_tokens} token\n")
+    header = (f"{'sessions':>8} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}"
+              f" {'ttft p50':>8} {'ttft p95':>8} {'reject':>6} {'errors':>6} {'cpu':>6} {'rss MB':>7}")
+    print(header)
+    print("-" * len(header))
+    levels = []
+    try:
+        for sessions in args.levels:
+            level = run_level(url, sessions, args.duration, questions, args.think, args.max_turns,
+                              metrics_urls, args.seed + 1000 * sessions)
+            levels.append(level)
+            print_level(level)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        stub_server.should_exit = True
+
+    saturation = find_saturation(levels, args.slo)
+    if saturation is None:
+        print("\nNgay muc dau tien da qua tai hoac khong dat SLO")
+    elif saturation is levels[-1]:
+        print(f"\nChua bao hoa toi {saturation['sessions']} sessions, thu them muc cao hon")
+    else:
+        print(f"\nDiem bao hoa: ~{saturation['sessions']} sessions, {saturation['throughput_rps']:.2f} req/s moi pod")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "args": vars(args),
+                "levels": levels,
+                "saturation_sessions": saturation["sessions"] if saturation else None,
+            }, f, indent=2)
+        print(f"Da ghi {args.out}")
+
+if __name__ == "__main__":
+    main()
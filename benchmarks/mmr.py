@@ -0,0 +1,62 @@
+"""So sanh latency MMR cua LangChain FAISS voi VectorMMRRetriever theo fetch_k.
+
+    python -m benchmarks.mmr --vectors 20000 --fetch-k 10 50 100 200 500
+"""
+import argparse
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import FakeEmbeddings
+
+from src.config import settings
+from src.services.mmr import VectorMMRRetriever, normalize
+
+def build_store(n: int, dim: int):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectorstore = FAISS.from_embeddings(
+        [(f"chunk {i}", vector.tolist()) for i, vector in enumerate(vectors)],
+        FakeEmbeddings(size=dim),
+    )
+    return vectorstore, normalize(vectors)
+
+def timed(fn, queries):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+def run(n: int, dim: int, n_queries: int, k: int, fetch_ks):
+    vectorstore, vectors = build_store(n, dim)
+    queries = np.random.default_rng(1).standard_normal((n_queries, dim)).astype(np.float32)
+    print(f"{n} vectors x {dim} chieu, {n_queries} queries, k={k}\n")
+
+    header = f"{'fetch_k':>8} {'langchain p50':>14} {'p95':>8} {'vector p50':>11} {'p95':>8} {'speedup':>8} {'same':>6}"
+    print(header)
+    print("-" * len(header))
+    for fetch_k in fetch_ks:
+        retriever = VectorMMRRetriever(vectorstore=vectorstore, vectors=vectors, k=k, fetch_k=fetch_k)
+
+        def langchain_mmr(q):
+            return vectorstore.max_marginal_relevance_search_by_vector(q.tolist(), k=k, fetch_k=fetch_k)
+
+        same = np.mean([
+            [d.page_content for d in langchain_mmr(q)] == [d.page_content for d in retriever.search_by_vector(q)]
+            for q in queries[:20]
+        ])
+        lc50, lc95 = timed(langchain_mmr, queries)
+        vec50, vec95 = timed(retriever.search_by_vector, queries)
+        print(f"{fetch_k:>8} {lc50:>14.3f} {lc95:>8.3f} {vec50:>11.3f} {vec95:>8.3f} {lc50 / vec50:>7.1f}x {same:>6.0%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency MMR: LangChain FAISS vs VectorMMRRetriever")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=settings.SEARCH_K)
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[10, 50, 100, 200, 500])
+    args = parser.parse_args()
+    run(args.vectors, args.dim, args.queries, args.k, args.fetch_k)
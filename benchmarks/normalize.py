@@ -0,0 +1,85 @@
+"""So sanh normalize_query cu (str.replace tung alias) voi AliasMatcher (trie, mot lan duyet).
+
+    python -m benchmarks.normalize --sizes 0 1000 5000 --queries 20000
+
+Size 0 la bang alias hien tai (src/config/aliases.json); size N them N alias sinh
+ngau nhien de xem chi phi khi bang alias lon len. "warm" la khi cau hoi lap lai
+lay tu lru_cache cua normalize_query.
+"""
+import argparse
+import json
+import random
+import time
+from functools import lru_cache
+
+from benchmarks.suite import QUESTIONS
+from src.config import settings
+from src.utils.aliases import AliasMatcher, fold
+
+def legacy_normalize(question: str, groups) -> str:
+    # Cach cu: lower() roi moi alias mot lan `in` + str.replace tren ca cau hoi
+    q = question.lower()
+    for aliases in groups:
+        for k, v in aliases.items():
+            if k in q:
+                q = q.replace(k, v)
+    return q
+
+def load_groups():
+    with open(settings.ALIASES_PATH, encoding="utf-8") as f:
+        return list(json.load(f).values())
+
+def synthetic_aliases(n: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    syllables = "an binh cuong dung giang hai khanh lam minh nam phuc quang son tam uyen vinh".split()
+    aliases = {}
+    while len(aliases) < n:
+        alias = " ".join(rng.choice(syllables) for _ in range(rng.randint(1, 3))) + f" {len(aliases)}"
+        aliases[alias] = f"Alias{len(aliases)}"
+    return aliases
+
+def make_queries(n: int, seed: int = 1):
+    # Them so ngau nhien de cau hoi it lap lai, do dung phan matcher chu khong phai cache
+    rng = random.Random(seed)
+    return [f"{rng.choice(QUESTIONS)} {rng.randint(0, 10 * n)}" for _ in range(n)]
+
+def throughput(fn, queries) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return len(queries) / (time.perf_counter() - start)
+
+def run(sizes, n_queries: int):
+    base_groups = load_groups()
+    queries = make_queries(n_queries)
+
+    base = AliasMatcher({k: v for group in base_groups for k, v in group.items()})
+    mismatches = [q for q in QUESTIONS if legacy_normalize(q, base_groups) != base.replace(fold(q))]
+    print(f"{len(QUESTIONS)} cau hoi mau, {len(mismatches)} khac ket qua cach cu")
+    for q in mismatches:
+        print(f"  {q!r}: {legacy_normalize(q, base_groups)!r} -> {base.replace(fold(q))!r}")
+    print(f"{n_queries} queries\n")
+
+    header = f"{'aliases':>8} {'legacy q/s':>11} {'trie q/s':>10} {'speedup':>8} {'warm q/s':>10} {'build ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for size in sizes:
+        groups = base_groups + [synthetic_aliases(size)] if size else base_groups
+        start = time.perf_counter()
+        matcher = AliasMatcher({k: v for group in groups for k, v in group.items()})
+        build_ms = (time.perf_counter() - start) * 1000
+
+        legacy = throughput(lambda q: legacy_normalize(q, groups), queries)
+        trie = throughput(lambda q: matcher.replace(fold(q)), queries)
+        # Cau hoi lap lai (vd cau hoi goi y) lay tu lru_cache nhu normalize_query
+        cached = lru_cache(maxsize=settings.NORMALIZE_CACHE_SIZE)(lambda q: matcher.replace(fold(q)))
+        warm = throughput(cached, [QUESTIONS[i % len(QUESTIONS)] for i in range(n_queries)])
+        total = sum(len(group) for group in groups)
+        print(f"{total:>8} {legacy:>11.0f} {trie:>10.0f} {trie / legacy:>7.1f}x {warm:>10.0f} {build_ms:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput normalize_query cu va moi")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.sizes, args.queries)
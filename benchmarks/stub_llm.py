@@ -0,0 +1,87 @@
+"""Server gia lap API chat completions cua OpenAI/Groq de do latency khong can Groq that.
+
+    python -m benchmarks.stub_llm --port 8001 --ttft 0.3 --tail-prob 0.05 --tail-ttft 3 --error-rate 0.02
+    LLM_BASE_URL=http://localhost:8001/v1 streamlit run src/main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+@dataclass
+class StubConfig:
+    ttft: float = 0.3  # giay toi token dau tien
+    tail_prob: float = 0.05  # ti le request bi cham bat thuong
+    tail_ttft: float = 3.0
+    token_delay: float = 0.01
+    tokens: int = 50
+    error_rate: float = 0.0  # ti le tra 429/503
+
+def make_app(config: StubConfig):
+    async def completions(request):
+        body = await request.json()
+        if random.random() < config.error_rate:
+            status = random.choice([429, 503])
+            return JSONResponse({"error": {"message": "stub error"}}, status_code=status, headers={"retry-after": "0"})
+
+        ttft = config.tail_ttft if random.random() < config.tail_prob else config.ttft
+        words = [f"token{i} " for i in range(config.tokens)]
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + config.token_delay * config.tokens)
+            return JSONResponse({
+                "id": "stub", "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)}, "finish_reason": "stop"}],
+            })
+
+        async def events():
+            await asyncio.sleep(ttft)
+            for word in words:
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(config.token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_in_thread(config: StubConfig, port: int = None):
+    """Chay stub trong thread nen cho benchmark; tra ve (base_url, server)."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(make_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1", server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub API chat completions kieu OpenAI/Groq")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=StubConfig.ttft)
+    parser.add_argument("--tail-prob", type=float, default=StubConfig.tail_prob)
+    parser.add_argument("--tail-ttft", type=float, default=StubConfig.tail_ttft)
+    parser.add_argument("--token-delay", type=float, default=StubConfig.token_delay)
+    parser.add_argument("--tokens", type=int, default=StubConfig.tokens)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    args = parser.parse_args()
+    config = StubConfig(args.ttft, args.tail_prob, args.tail_ttft, args.token_delay, args.tokens, args.error_rate)
+    uvicorn.run(make_app(config), host="0.0.0.0", port=args.port)
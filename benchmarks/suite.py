@@ -0,0 +1,292 @@
+"""Benchmark offline cac thanh phan chinh, ghi ket qua JSON va so voi baseline.
+
+    python -m benchmarks.suite run --out bench_results/latest.json
+    python -m benchmarks.suite compare benchmarks/baseline.json bench_results/latest.json --threshold 0.25
+
+Khong can mang: corpus sinh ngau nhien (co dinh seed), embedding backend "hash"
+va LLM la stub (benchmarks/stub_llm.py) tra loi ngay. Moi phan chay trong mot
+process rieng de thoi gian load va RSS khong bi anh huong boi phan truoc.
+compare tra ve exit code 1 neu co metric te hon baseline qua threshold.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+WORDS = (
+    "aws ec2 s3 vpc subnet iam lambda rds dynamodb eks ecs cloudwatch sns sqs route53 cloudfront "
+    "alb nlb autoscaling bucket policy role instance cluster node pod deploy kien truc mang bao mat "
+    "chi phi hoc vien mentor workshop chuong trinh diem danh quy dinh bai tap du an nhom tuan "
+    "backup snapshot region availability zone gateway endpoint nat internet private public "
+    "monitoring alarm log metric pipeline codebuild codepipeline terraform cloudformation stack"
+).split()
+QUESTIONS = [
+    "anh hưng là ai?",
+    "FCJ có những quy định gì về điểm danh?",
+    "Làm sao để vẽ kiến trúc VPC với public và private subnet?",
+    "first cloud journey tổ chức workshop EKS khi nào",
+    "chị thư phụ trách phần nào trong chương trình fcaj",
+    "S3 bucket policy khác IAM role như thế nào?",
+]
+# Metric nao cang thap cang tot (latency, RSS) hay cang cao cang tot (throughput)
+LOWER, HIGHER = "lower", "higher"
+
+def percentile_ms(samples, q) -> float:
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {"value": round(float(value), 4), "unit": unit, "better": better}
+
+def make_corpus(path: str, n_docs: int, words_per_doc: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(n_docs):
+        folder = os.path.join(path, f"topic{i % 4}")
+        os.makedirs(folder, exist_ok=True)
+        sentences = []
+        for _ in range(words_per_doc // 12):
+            sentences.append(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+        with open(os.path.join(folder, f"doc{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(" ".join(sentences[j:j + 5]) for j in range(0, len(sentences), 5)))
+
+def make_queries(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))) for _ in range(n)]
+
+def configure(workdir: str):
+    from src.config import settings
+
+    # DATA_PATH/VECTORSTORE_PATH la duong dan tuong doi, worker cua process_docs cung doc theo cwd
+    os.chdir(workdir)
+    settings.EMBEDDING_BACKEND = "hash"
+    settings.ANSWER_CACHE_ENABLED = False
+    settings.INDEX_RELOAD_INTERVAL = 0
+    settings.METRICS_PORT = 0
+    settings.PROFILE_MODE = "off"
+    return settings
+
+def max_rss_mb() -> float:
+    # ru_maxrss tinh bang KB tren Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def bench_ingest(workdir: str, workers: int) -> dict:
+    configure(workdir)
+    from src.process_docs import process_documents
+
+    start = time.perf_counter()
+    process_documents(full_rebuild=True, workers=workers)
+    elapsed = time.perf_counter() - start
+
+    from src.services.versions import active_path
+    with open(os.path.join(active_path(), "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    n_docs = len(manifest["files"])
+    n_chunks = sum(len(entry["ids"]) for entry in manifest["files"].values())
+    return {
+        "ingest.docs_per_s": metric(n_docs / elapsed, "docs/s", HIGHER),
+        "ingest.chunks_per_s": metric(n_chunks / elapsed, "chunks/s", HIGHER),
+    }
+
+def measure(fn, queries, repeat: int = 1):
+    for q in queries[:5]:
+        fn(q)
+    latencies = []
+    for _ in range(repeat):
+        for q in queries:
+            start = time.perf_counter()
+            fn(q)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def bench_retrieval(workdir: str, n_queries: int, ks) -> dict:
+    settings = configure(workdir)
+    from src.services.embeddings import get_embeddings
+    from src.services.rag_service import make_retriever, open_vectorstore
+    from src.services.versions import active_path
+
+    path = active_path()
+    vectorstore = open_vectorstore(path, get_embeddings())
+    queries = make_queries(n_queries)
+    results = {}
+    for mode in ("dense", "hybrid"):
+        for search_type in ("similarity", "mmr"):
+            for k in ks:
+                settings.RETRIEVAL_MODE, settings.SEARCH_TYPE, settings.SEARCH_K = mode, search_type, k
+                settings.FETCH_K = 2 * k
+                retriever = make_retriever(path, vectorstore)
+                latencies = measure(retriever.invoke, queries)
+                name = f"retrieve.{mode}.{search_type}.k{k}"
+                results[f"{name}.p50_ms"] = metric(percentile_ms(latencies, 50), "ms", LOWER)
+                results[f"{name}.p95_ms"] = metric(percentile_ms(latencies, 95), "ms", LOWER)
+    return results
+
+def bench_serving(workdir: str, n_queries: int) -> dict:
+    """Load vectorstore (thoi gian, RSS) va chain end-to-end voi LLM stub, tru phan LLM."""
+    settings = configure(workdir)
+    from benchmarks.stub_llm import StubConfig, start_in_thread
+
+    base_url, server = start_in_thread(StubConfig(ttft=0, tail_prob=0, token_delay=0, tokens=5))
+    settings.LLM_BASE_URL = base_url
+
+    import src.services.rag_service as rag
+    from src.services.tracing import trace
+
+    rss_before = max_rss_mb()
+    start = time.perf_counter()
+    rag.load_vectorstore()
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_after = max_rss_mb()
+
+    def answer(question):
+        with trace() as spans:
+            "".join(rag.stream_answer(question))
+        return sum(seconds for stage, seconds in spans if stage == "llm")
+
+    queries = make_queries(n_queries, seed=2)
+    totals, without_llm = [], []
+    answer(queries[0])
+    for q in queries:
+        start = time.perf_counter()
+        llm = answer(q)
+        total = time.perf_counter() - start
+        totals.append(total)
+        without_llm.append(total - llm)
+    server.should_exit = True
+    return {
+        "load.ms": metric(load_ms, "ms", LOWER),
+        "load.rss_mb": metric(rss_after - rss_before, "MB", LOWER),
+        "chain.p50_ms": metric(percentile_ms(without_llm, 50), "ms", LOWER),
+        "chain.p95_ms": metric(percentile_ms(without_llm, 95), "ms", LOWER),
+        "chain.with_stub_llm.p50_ms": metric(percentile_ms(totals, 50), "ms", LOWER),
+    }
+
+def bench_normalize(n: int) -> dict:
+    from src.utils.helpers import normalize_query
+
+    # Cau hoi khac nhau va goi ham goc (bo lru_cache) de do matcher chu khong phai cache hit
+    normalize = normalize_query.__wrapped__
+    questions = [f"{QUESTIONS[i % len(QUESTIONS)]} {i}" for i in range(n)]
+    normalize(questions[0])
+    start = time.perf_counter()
+    for q in questions:
+        normalize(q)
+    elapsed = time.perf_counter() - start
+    return {"normalize.queries_per_s": metric(n / elapsed, "queries/s", HIGHER)}
+
+def in_process(fn, *args):
+    # ProcessPoolExecutor thay vi multiprocessing.Pool: process_documents tu tao process con
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        make_corpus(os.path.join(workdir, "data"), args.docs, args.words)
+        metrics = {}
+        for name, fn, fn_args in [
+            ("ingest", bench_ingest, (workdir, args.workers)),
+            ("retrieval", bench_retrieval, (workdir, args.queries, args.k)),
+            ("serving", bench_serving, (workdir, args.queries)),
+            ("normalize", bench_normalize, (args.normalize,)),
+        ]:
+            start = time.perf_counter()
+            metrics.update(in_process(fn, *fn_args))
+            print(f"{name}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "docs": args.docs,
+            "words_per_doc": args.words,
+            "queries": args.queries,
+        },
+        "metrics": metrics,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """Tra ve (dong bang so sanh, danh sach metric bi regression)."""
+    rows, regressions = [], []
+    for name, base in baseline["metrics"].items():
+        cur = current["metrics"].get(name)
+        if cur is None:
+            rows.append((name, base["value"], None, None, "thieu"))
+            continue
+        if base["value"] == 0:
+            change = 0.0
+        else:
+            change = (cur["value"] - base["value"]) / base["value"]
+        worse = change if base["better"] == LOWER else -change
+        status = "REGRESSION" if worse > threshold else "ok"
+        if worse > threshold:
+            regressions.append(name)
+        rows.append((name, base["value"], cur["value"], change, status))
+    return rows, regressions
+
+def print_comparison(rows, threshold: float):
+    header = f"{'metric':<42} {'baseline':>10} {'current':>10} {'change':>8}  status"
+    print(f"Threshold {threshold:.0%}\n")
+    print(header)
+    print("-" * len(header))
+    for name, base, cur, change, status in rows:
+        cur_text = f"{cur:>10.2f}" if cur is not None else f"{'-':>10}"
+        change_text = f"{change:>+8.1%}" if change is not None else f"{'-':>8}"
+        print(f"{name:<42} {base:>10.2f} {cur_text} {change_text}  {status}")
+
+def print_results(results: dict):
+    for name, m in results["metrics"].items():
+        print(f"{name:<42} {m['value']:>10.2f} {m['unit']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline va kiem tra regression")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Chay benchmark va ghi JSON")
+    run_parser.add_argument("--out", default="bench_results/latest.json")
+    run_parser.add_argument("--docs", type=int, default=200)
+    run_parser.add_argument("--words", type=int, default=600, help="So tu moi tai lieu")
+    run_parser.add_argument("--queries", type=int, default=200)
+    run_parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    run_parser.add_argument("--workers", type=int, default=2)
+    run_parser.add_argument("--normalize", type=int, default=100000, help="So cau cho normalize_query")
+
+    compare_parser = sub.add_parser("compare", help="So ket qua voi baseline, exit 1 neu regression")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current", nargs="?", default="bench_results/latest.json")
+    compare_parser.add_argument("--threshold", type=float, default=0.25, help="Ti le te hon toi da, vd 0.25 = 25%%")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        results = run(args)
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print_results(results)
+        print(f"\nDa ghi {args.out}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    rows, regressions = compare(baseline, current, args.threshold)
+    print_comparison(rows, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} metric te hon baseline qua {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
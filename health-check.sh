@@ -1,19 +1,29 @@
 #!/bin/bash
 
 # Health check script for FCAJ Chatbot
-# Usage: ./health-check.sh [url]
+# Usage: ./health-check.sh [url] [ready-url]
 
 URL=${1:-"http://localhost:8501"}
+READY_URL=${2:-"http://localhost:9100/ready"}
 
 echo "🏥 Checking health of FCAJ Chatbot at $URL..."
 
 # Check if service is responding
 HTTP_CODE=$(curl -s -o /dev/null -w "%{http_code}" $URL/_stcore/health)
 
-if [ $HTTP_CODE -eq 200 ]; then
-    echo "✅ Service is healthy (HTTP $HTTP_CODE)"
+if [ $HTTP_CODE -ne 200 ]; then
+    echo "❌ Service is unhealthy (HTTP $HTTP_CODE)"
+    exit 1
+fi
+echo "✅ Service is healthy (HTTP $HTTP_CODE)"
+
+# Check if model, vectorstore and LLM client are warmed up
+READY_CODE=$(curl -s -o /dev/null -w "%{http_code}" $READY_URL)
+
+if [ $READY_CODE -eq 200 ]; then
+    echo "✅ Service is ready (HTTP $READY_CODE)"
     exit 0
 else
-    echo "❌ Service is unhealthy (HTTP $HTTP_CODE)"
+    echo "⏳ Service is not ready yet (HTTP $READY_CODE): $(curl -s $READY_URL)"
     exit 1
 fi
@@ -0,0 +1,172 @@
+"""HTTP API cho RAG service, chay doc lap voi Streamlit:
+
+    uvicorn src.api:app --host 0.0.0.0 --port 8000
+
+POST /chat          {"question": "...", "history": [{"role": "user", "content": "..."}]} -> {"answer": "..."}
+POST /chat/stream   cung body, tra ve server-sent events: data: {"token": "..."} ... event: done
+GET  /health        liveness
+GET  /ready         readiness: 200 khi da warm-up xong
+GET  /metrics       Prometheus (hang doi, thoi gian cho...)
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from src.config import settings
+from src.services import metrics
+from src.services.admission import Rejected
+from src.services.profiling import profile_request
+from src.services.rag_service import get_vectorstore_manager, get_warmup, stream_answer
+from src.utils.helpers import normalize_query
+
+# Embed, FAISS va goi Groq deu blocking: chay tren pool gioi han de event loop khong bi chan.
+# Request dang xep hang cho slot (admission) cung giu mot thread, nen cong them MAX_QUEUE thread;
+# neu khong, cac request dang cho chiem het pool va request dang giu slot khong lay duoc token tiep
+executor = ThreadPoolExecutor(max_workers=settings.API_WORKERS + settings.MAX_QUEUE, thread_name_prefix="rag-api")
+
+class BadRequest(Exception):
+    pass
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+def close_after(pending, iterator):
+    # Generator dang chay next() o thread khac thi chua close duoc: doi lan next() do xong
+    if pending is not None:
+        wait([pending])
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
+
+async def iterate_blocking(iterator):
+    # Moi lan lay token chi giu mot thread trong pool, khong giu suot thoi gian sinh cau tra loi
+    done = object()
+    pending = None
+    try:
+        while True:
+            pending = executor.submit(next, iterator, done)
+            item = await asyncio.wrap_future(pending)
+            if item is done:
+                return
+            yield item
+    finally:
+        # Client ngat ket noi: close generator (tra slot admission, huy request LLM) tren pool,
+        # khong de GC close no tren event loop. Khong await vi task co the dang bi huy
+        executor.submit(close_after, pending, iterator)
+
+async def parse_request(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("Body phai la JSON")
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        raise BadRequest("Thieu 'question'")
+    history = body.get("history") or []
+    if not isinstance(history, list) or not all(
+        isinstance(m, dict) and m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+        for m in history
+    ):
+        raise BadRequest("'history' phai la danh sach {role: user|assistant, content}")
+    return normalize_query(question), history
+
+async def chat(request):
+    try:
+        question, history = await parse_request(request)
+    except BadRequest as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    def generate():
+        # X-Profile: 1 ep profile request nay (khi PROFILE_MODE khac off)
+        with profile_request("api", force=request.headers.get("x-profile") == "1"):
+            return "".join(stream_answer(question, history))
+
+    try:
+        answer = await run_blocking(generate)
+    except Rejected as e:
+        return overloaded(e)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    return JSONResponse({"answer": answer, "version": get_vectorstore_manager().version})
+
+def overloaded(error: Rejected):
+    return JSONResponse(
+        {"error": str(error), "reason": error.reason},
+        status_code=503,
+        headers={"Retry-After": str(int(settings.QUEUE_TIMEOUT))},
+    )
+
+def sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def chat_stream(request):
+    try:
+        question, history = await parse_request(request)
+    except BadRequest as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    # Lay token dau truoc khi tra header, de qua tai/loi som van tra ve ma HTTP dung
+    tokens = iterate_blocking(stream_answer(question, history))
+    try:
+        first = await tokens.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except Rejected as e:
+        return overloaded(e)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    async def events():
+        try:
+            if first is not None:
+                yield sse({"token": first})
+            async for token in tokens:
+                yield sse({"token": token})
+        except Exception as e:
+            # Header 200 da gui di nen loi bao bang event rieng
+            yield sse({"error": str(e)}, event="error")
+            return
+        finally:
+            # Bi huy/close giua chung (client ngat ket noi) thi close luon iterator ben duoi
+            await tokens.aclose()
+        yield sse({"version": get_vectorstore_manager().version}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def metrics_endpoint(request):
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+async def health(request):
+    # Liveness: process con song, khong phu thuoc warm-up
+    return JSONResponse({"status": "ok"})
+
+async def ready(request):
+    status, _, body = get_warmup().readiness()
+    return Response(body, status_code=status, media_type="application/json")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load model embedding, index va LLM client o background, dung chung cho moi request;
+    # /ready tra 503 toi khi xong
+    get_warmup()
+    yield
+    if get_warmup().ready:
+        get_vectorstore_manager().stop_watching()
+    executor.shutdown(wait=False)
+
+app = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/chat/stream", chat_stream, methods=["POST"]),
+        Route("/health", health),
+        Route("/ready", ready),
+        Route("/metrics", metrics_endpoint),
+    ],
+    lifespan=lifespan,
+)
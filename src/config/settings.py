@@ -8,15 +8,100 @@ class Settings:
     EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
     LLM_MODEL = "llama-3.1-8b-instant"
     LLM_TEMPERATURE = 0.1
+    # API kieu OpenAI cua Groq; tro sang stub (benchmarks/stub_llm.py) de do latency
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))  # giay cho moi lan doc
+    LLM_CONNECT_TIMEOUT = 5
+    LLM_MAX_RETRIES = 2  # chi retry 429/5xx/timeout truoc token dau tien
+    LLM_MAX_CONNECTIONS = 20
+    LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+    LLM_HEDGE_MIN_DELAY = 1.0  # giay, hedge sau max(gia tri nay, p95 TTFT)
     VECTORSTORE_PATH = "vectorstore"
+    # mmap: index mmap + docstore SQLite lazy | pickle: FAISS.load_local nhu cu
+    VECTORSTORE_FORMAT = os.getenv("VECTORSTORE_FORMAT", "mmap")
+    INDEX_RELOAD_INTERVAL = int(os.getenv("INDEX_RELOAD_INTERVAL", 30))  # giay, 0 = tat
+    KEEP_VERSIONS = 3
     DATA_PATH = "data"
+    MANIFEST_FILE = "manifest.json"
     CACHE_FOLDER = "/tmp/huggingface"
+    # torch: HuggingFaceEmbeddings | onnx: model export boi src/export_onnx.py, khong can torch
+    # hash: khong can model, chi cho benchmark offline (benchmarks/suite.py)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "models/onnx")
+    ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"  # int8 dynamic
+    ONNX_THREADS = int(os.getenv("ONNX_THREADS", 0))  # 0 = onnxruntime tu chon
+    # Embed query: gom request dong thoi trong cua so nay thanh mot batch, cache query lap lai
+    QUERY_BATCH_WINDOW_MS = 5
+    QUERY_MAX_BATCH = 32
+    QUERY_CACHE_SIZE = 1024
+    QUERY_CACHE_TTL = 3600  # giay
+
+    # Cache cau tra loi: xoa khi vectorstore doi version
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "cache/answers.sqlite")
+    ANSWER_CACHE_SIZE = 1000
+    ANSWER_CACHE_TTL = 86400  # giay
+    ANSWER_CACHE_THRESHOLD = 0.95  # cosine toi thieu de coi la cung cau hoi
+
+    # Lich su hoi thoai (token uoc luong theo tu)
+    HISTORY_TOKEN_BUDGET = 800  # cac luot gan nhat giu nguyen van
+    HISTORY_SUMMARY_TOKENS = 150  # cau hoi cu hon chi giu lai dang tom tat
+    RETRIEVAL_QUERY_TOKENS = 64
+    FOLLOWUP_MAX_TOKENS = 8  # cau hoi ngan hon thi ghep them cau hoi truoc khi search
     
+    # Alias -> ten chuan khi normalize cau hoi (ten admin, FCAJ...), xem src/utils/aliases.py
+    ALIASES_PATH = os.getenv("ALIASES_PATH", os.path.join(os.path.dirname(__file__), "aliases.json"))
+    NORMALIZE_CACHE_SIZE = 4096  # so cau hoi da normalize giu lai trong bo nho
+
     # RAG settings
     SEARCH_TYPE = "mmr"
     SEARCH_K = 5
     FETCH_K = 10
     CHUNK_SIZE = 500
     CHUNK_OVERLAP = 100
+    CONTEXT_TOKEN_BUDGET = 1200  # token uoc luong cho phan context trong prompt
+    # hybrid: BM25 + dense gop bang RRF | dense: chi FAISS
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+    HYBRID_CANDIDATES = 20
+    RRF_K = 60
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+
+    # Index settings: flat | hnsw | ivf_flat | ivf_pq, luu vector float32 | float16 | sq8
+    INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+    INDEX_STORAGE = os.getenv("INDEX_STORAGE", "float32")
+    HNSW_M = 32
+    HNSW_EF_SEARCH = 64
+    IVF_NLIST = 0  # 0 = tu chon theo so vector
+    IVF_NPROBE = 8
+    PQ_M = 16
+    PQ_NBITS = 8
+
+    # Shard settings: none | folder (thu muc con dau tien trong data/) | hash
+    SHARD_BY = os.getenv("SHARD_BY", "none")
+    NUM_SHARDS = 4
+    SEARCH_THREADS = 4
+
+    # Gioi han so cau tra loi sinh dong thoi moi pod, phan con lai xep hang
+    MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", 8))
+    MAX_QUEUE = int(os.getenv("MAX_QUEUE", 32))
+    QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", 20))  # giay cho toi da truoc khi tu choi
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))  # /metrics Prometheus, 0 = tat
+
+    # Profile tung request: off | cprofile (.prof) | sample (stack .folded kieu py-spy)
+    PROFILE_MODE = os.getenv("PROFILE_MODE", "off")
+    PROFILE_RATE = float(os.getenv("PROFILE_RATE", 0.01))  # ti le request duoc profile
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+
+    # HTTP API (src/api.py): so thread chay embed/FAISS/LLM dong thoi
+    API_WORKERS = int(os.getenv("API_WORKERS", 8))
+
+    # Ingest settings
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+    FLUSH_EVERY = int(os.getenv("FLUSH_EVERY", 2000))
+    DEDUP_ENABLED = True
+    DEDUP_MAX_DISTANCE = 3
 
 settings = Settings()
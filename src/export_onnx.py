@@ -0,0 +1,51 @@
+import argparse
+import os
+
+from src.config import settings
+from src.services.embeddings import ONNX_INT8_FILE, ONNX_MODEL_FILE, TOKENIZER_FILE
+
+def export_onnx(output: str, quantize: bool = True):
+    """Export EMBEDDING_MODEL sang ONNX (va ban int8 dynamic) cho EMBEDDING_BACKEND=onnx.
+
+    Chi can torch/transformers luc export; luc chay chi can onnxruntime va tokenizers.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL, cache_dir=settings.CACHE_FOLDER)
+    model = AutoModel.from_pretrained(settings.EMBEDDING_MODEL, cache_dir=settings.CACHE_FOLDER).eval()
+    # Chi giu tokenizer.json (tokenizers ban Rust), khong can transformers luc chay
+    tokenizer.backend_tokenizer.save(os.path.join(output, TOKENIZER_FILE))
+
+    sample = tokenizer(["Xin chao AWS"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    inputs = tuple(sample[name] for name in names if name in sample)
+    names = names[:len(inputs)]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, inputs, model_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=14,
+        )
+    print(f"Da export {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output, ONNX_INT8_FILE)
+        quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Da quantize int8 {int8_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export embedding model sang ONNX")
+    parser.add_argument("--output", default=settings.ONNX_MODEL_PATH)
+    parser.add_argument("--no-quantize", action="store_true", help="Khong tao ban int8")
+    args = parser.parse_args()
+    export_onnx(args.output, quantize=not args.no_quantize)
@@ -2,9 +2,13 @@ import time
 import streamlit as st
 
 from src.utils.helpers import get_base64_image, normalize_query
-from src.services.rag_service import setup_rag_chain
+from src.services.admission import Rejected
+from src.services.profiling import profile_request
+from src.services.rag_service import get_warmup, stream_answer
+from src.services.tracing import format_spans, span, trace
 
-def show_loading_page():
+def show_loading_page(warmup):
+    # Hien tien do warm-up that (load model, index, LLM) thay vi sleep co dinh
     pepe_base64 = get_base64_image("public/static/image/pepe.gif")
     
     loading_html = f"""
@@ -14,57 +18,92 @@ def show_loading_page():
             flex-direction: column;
             align-items: center;
             justify-content: center;
-            height: 80vh;
+            height: 60vh;
         }}
         .pepe-gif {{
             width: 150px;
             margin-bottom: 20px;
         }}
-        .progress-bar {{
-            width: 300px;
-            height: 20px;
-            background: #f0f0f0;
-            border-radius: 10px;
-            overflow: hidden;
-            margin-top: 20px;
-        }}
-        .progress-fill {{
-            height: 100%;
-            background: linear-gradient(90deg, #FF9900 0%, #FF6600 100%);
-            animation: progress 2s ease-in-out;
-        }}
-        @keyframes progress {{
-            from {{ width: 0%; }}
-            to {{ width: 100%; }}
-        }}
     </style>
     <div class="loading-container">
         <img src="data:image/gif;base64,{pepe_base64}" class="pepe-gif">
         <h2>Đang khởi động FCAJ Assistant...</h2>
-        <div class="progress-bar">
-            <div class="progress-fill"></div>
-        </div>
     </div>
     """
     
     placeholder = st.empty()
-    placeholder.markdown(loading_html, unsafe_allow_html=True)
-    time.sleep(2)
+    with placeholder.container():
+        st.markdown(loading_html, unsafe_allow_html=True)
+        progress = st.progress(0.0)
+
+    while not warmup.ready:
+        state = warmup.state()
+        if state["error"]:
+            # Loi (vd chua co vectorstore) se hien khi nguoi dung hoi, khong chan giao dien
+            break
+        progress.progress(state["completed"] / state["total"], text=f"{state['step'] or ''}...")
+        time.sleep(0.2)
     placeholder.empty()
 
-def get_response(question: str) -> str:
-    try:
-        normalized = normalize_query(question)
-        rag_chain = setup_rag_chain()
-        
-        if "messages" in st.session_state and len(st.session_state.messages) > 1:
-            history = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in st.session_state.messages[:-1]])
-            context_question = f"Lịch sử cuộc trò chuyện:\n{history}\n\nCâu hỏi hiện tại: {normalized}"
-            return rag_chain.invoke(context_question)
-        
-        return rag_chain.invoke(normalized)
-    except Exception as e:
-        return f"⚠️ Lỗi: {str(e)}"
+def stream_response(question: str, timing: dict, on_queue=None):
+    # Yield tung token cua cau tra loi; ghi TTFT, tong thoi gian va thoi gian tung buoc vao timing
+    start = time.perf_counter()
+    with trace() as spans, profile_request("streamlit"):
+        try:
+            with span("normalize"):
+                normalized = normalize_query(question)
+            history = st.session_state.get("messages", [])[:-1]
+
+            for chunk in stream_answer(normalized, history, on_queue):
+                if "ttft" not in timing:
+                    timing["ttft"] = time.perf_counter() - start
+                yield chunk
+        except Rejected as e:
+            yield f"⏳ {e}"
+        except Exception as e:
+            yield ("\n\n" if "ttft" in timing else "") + f"⚠️ Lỗi: {str(e)}"
+        finally:
+            timing["total"] = time.perf_counter() - start
+            timing["stages"] = format_spans(spans)
+
+def ask(question: str):
+    # Callback chay truoc lan chay lai script, nen cau hoi duoc tra loi ngay trong lan chay do
+    st.session_state.messages.append({"role": "user", "content": question})
+
+def submit_chat_input():
+    ask(st.session_state.chat_input)
+
+def show_answer(question: str) -> dict:
+    with st.chat_message("assistant", avatar=st.session_state.bot_avatar):
+        pepe_base64 = get_base64_image("public/static/image/pepe.gif")
+        loading = st.empty()
+
+        def show_status(text):
+            loading.markdown(f'<img src="data:image/gif;base64,{pepe_base64}" width="30" style="display:inline; margin-right:10px;"><b>{text}</b>', unsafe_allow_html=True)
+
+        def show_queue(position):
+            show_status(f"Đang có nhiều người hỏi, bạn đang ở vị trí thứ {position} trong hàng chờ...")
+
+        show_status("Đang tìm kiếm thông tin...")
+        timing = {}
+
+        def tokens():
+            for i, chunk in enumerate(stream_response(question, timing, show_queue)):
+                if i == 0:
+                    loading.empty()
+                yield chunk
+
+        answer = st.write_stream(tokens())
+    stages = timing.pop("stages", "")
+    print(f"Tra loi xong: ttft={timing.get('ttft', timing['total']):.2f}s total={timing['total']:.2f}s {stages}")
+    return {"role": "assistant", "content": answer, **timing}
+
+SUGGESTIONS = [
+    ("👥 Đội admin FCAJ gồm những ai?", "Đội admin FCAJ gồm những ai?"),
+    ("📊 Cách tính điểm như thế nào?", "Cách tính điểm như thế nào?"),
+    ("☁️ FCAJ là gì?", "FCAJ là gì?"),
+    ("📝 Nội dung project là gì?", "Nội dung project là gì?"),
+]
 
 st.set_page_config(
     page_title="FCAJ Assistant",
@@ -77,10 +116,12 @@ st.set_page_config(
     },
 )
 
-if "loaded" not in st.session_state:
-    show_loading_page()
-    st.session_state.loaded = True
+warmup = get_warmup()
+if not warmup.ready:
+    show_loading_page(warmup)
 
+if "messages" not in st.session_state:
+    st.session_state.messages = []
 if "user_avatar" not in st.session_state:
     st.session_state.user_avatar = "👤"
 if "bot_avatar" not in st.session_state:
@@ -155,9 +196,7 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 🛠️ Công cụ")
 
-    if st.button("🔄 Làm mới cuộc trò chuyện"):
-        st.session_state.messages = []
-        st.rerun()
+    st.button("🔄 Làm mới cuộc trò chuyện", on_click=st.session_state.messages.clear)
 
     st.markdown("---")
     st.markdown(
@@ -180,13 +219,20 @@ with st.sidebar:
         unsafe_allow_html=True,
     )
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+def show_message(message: dict):
+    avatar = st.session_state.user_avatar if message["role"] == "user" else st.session_state.bot_avatar
+    with st.chat_message(message["role"], avatar=avatar):
+        st.markdown(message["content"])
 
-if len(st.session_state.messages) == 0:
-    with st.chat_message("assistant", avatar=st.session_state.bot_avatar):
-        st.markdown(
-            """
+@st.fragment
+def show_chat(rendered: int):
+    # Bam cau hoi goi y chi chay lai fragment nay, khong chay lai CSS, header va sidebar.
+    # rendered tin nhan dau da ve o lan chay ca script, fragment chi ve luot moi
+    messages = st.session_state.messages
+    if not messages:
+        with st.chat_message("assistant", avatar=st.session_state.bot_avatar):
+            st.markdown(
+                """
 👋 Xin chào! Tôi là trợ lý AI của cộng đồng **First Cloud AI Journey (FCAJ)**.
 
 Tôi có thể giúp bạn:
@@ -196,66 +242,21 @@ Tôi có thể giúp bạn:
 - ⚠️ Xử lý vi phạm và nội quy
 
 Hãy thử các câu hỏi gợi ý bên dưới! 👇
-        """
-        )
-
-    col1, col2 = st.columns(2)
-
-    with col1:
-        if st.button("👥 Đội admin FCAJ gồm những ai?"):
-            st.session_state.messages.append(
-                {"role": "user", "content": "Đội admin FCAJ gồm những ai?"}
+            """
             )
-            st.rerun()
 
-        if st.button("📊 Cách tính điểm như thế nào?"):
-            st.session_state.messages.append(
-                {"role": "user", "content": "Cách tính điểm như thế nào?"}
-            )
-            st.rerun()
+        columns = st.columns(2)
+        for i, (label, question) in enumerate(SUGGESTIONS):
+            with columns[i // 2]:
+                st.button(label, on_click=ask, args=(question,))
 
-    with col2:
-        if st.button("☁️ FCAJ là gì?"):
-            st.session_state.messages.append({"role": "user", "content": "FCAJ là gì?"})
-            st.rerun()
+    for m in messages[rendered:]:
+        show_message(m)
 
-        if st.button("📝 Nội dung project là gì?"):
-            st.session_state.messages.append(
-                {"role": "user", "content": "Nội dung project là gì?"}
-            )
-            st.rerun()
+    if messages and messages[-1]["role"] == "user":
+        messages.append(show_answer(messages[-1]["content"]))
 
 for m in st.session_state.messages:
-    avatar = st.session_state.user_avatar if m["role"] == "user" else st.session_state.bot_avatar
-    with st.chat_message(m["role"], avatar=avatar):
-        st.markdown(m["content"])
-
-if len(st.session_state.messages) > 0:
-    last_msg = st.session_state.messages[-1]
-    if last_msg["role"] == "user":
-        if (
-            len(st.session_state.messages) == 1
-            or st.session_state.messages[-2]["role"] == "assistant"
-        ):
-            with st.chat_message("assistant", avatar=st.session_state.bot_avatar):
-                pepe_base64 = get_base64_image("public/static/image/pepe.gif")
-                st.markdown(f'<img src="data:image/gif;base64,{pepe_base64}" width="30" style="display:inline; margin-right:10px;"><b>Đang tìm kiếm thông tin...</b>', unsafe_allow_html=True)
-                answer = get_response(last_msg["content"])
-                st.markdown(answer)
-            st.session_state.messages.append({"role": "assistant", "content": answer})
-            st.rerun()
-
-user_input = st.chat_input("Hỏi về AWS, FCAJ...")
-
-if user_input:
-    st.session_state.messages.append({"role": "user", "content": user_input})
-    with st.chat_message("user", avatar=st.session_state.user_avatar):
-        st.markdown(user_input)
-
-    with st.chat_message("assistant", avatar=st.session_state.bot_avatar):
-        pepe_base64 = get_base64_image("public/static/image/pepe.gif")
-        st.markdown(f'<img src="data:image/gif;base64,{pepe_base64}" width="30" style="display:inline; margin-right:10px;"><b>Đang tìm kiếm thông tin...</b>', unsafe_allow_html=True)
-        answer = get_response(user_input)
-        st.markdown(answer)
-
-    st.session_state.messages.append({"role": "assistant", "content": answer})
+    show_message(m)
+show_chat(len(st.session_state.messages))
+st.chat_input("Hỏi về AWS, FCAJ...", key="chat_input", on_submit=submit_chat_input)
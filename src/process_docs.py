@@ -1,47 +1,445 @@
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    DirectoryLoader,
-)
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
 from src.config import settings
+from src.services.docstore import DOCSTORE_FILE, write_sqlite_docstore
+from src.services.embeddings import get_embeddings
+from src.services.lexical import BM25_FILE, write_bm25_index
+from src.services.mmr import VECTORS_FILE, write_vectors
+from src.services.shards import shard_for, shard_path
+from src.services.vector_index import save_serving_index, serving_fallback_name, serving_index_name
+from src.services.versions import (
+    active_path,
+    gc_versions,
+    new_version,
+    publish,
+    unpublished_version,
+    version_path,
+)
+from src.utils.dedup import NearDuplicateFilter, simhash
 
-def process_documents():
-    # Load documents từ thư mục data
-    loader = DirectoryLoader(f"{settings.DATA_PATH}/", glob="**/*.pdf", loader_cls=PyPDFLoader)
-    documents = loader.load()
-
-    # Thêm text files
-    text_loader = DirectoryLoader(
-        f"{settings.DATA_PATH}/",
-        glob="**/*.txt",
-        loader_cls=TextLoader,
-        loader_kwargs={"encoding": "utf-8"},
-    )
-    text_docs = text_loader.load()
-    documents.extend(text_docs)
+LOADERS = {
+    ".pdf": (PyPDFLoader, {}),
+    ".txt": (TextLoader, {"encoding": "utf-8"}),
+}
+
+def discover_files():
+    # Tim tat ca file PDF/TXT trong thu muc data, tra ve duong dan tuong doi
+    root = Path(settings.DATA_PATH)
+    files = [
+        p for p in root.rglob("*")
+        if p.is_file() and p.suffix.lower() in LOADERS
+    ]
+    return sorted(p.relative_to(root).as_posix() for p in files)
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
-    # Chia nhỏ documents
-    text_splitter = RecursiveCharacterTextSplitter(
+def load_file(path: str):
+    loader_cls, loader_kwargs = LOADERS[Path(path).suffix.lower()]
+    return loader_cls(path, **loader_kwargs).load()
+
+def get_text_splitter():
+    return RecursiveCharacterTextSplitter(
         chunk_size=settings.CHUNK_SIZE,
         chunk_overlap=settings.CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ". ", " ", ""]
+        separators=["\n\n", "\n", ". ", " ", ""],
+        # Vi tri chunk trong trang, de luc tra loi gop cac chunk chong len nhau
+        add_start_index=True,
     )
-    texts = text_splitter.split_documents(documents)
 
-    # Tạo embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name=settings.EMBEDDING_MODEL
+def load_and_split(rel: str):
+    # Chay trong process pool: doc file va chia nho ngay trong worker
+    path = os.path.join(settings.DATA_PATH, rel)
+    return rel, get_text_splitter().split_documents(load_file(path))
+
+def iter_split_files(files, workers: int):
+    # Tra ve (file, chunks) theo thu tu file nao xong truoc. Chi giu toi da
+    # 2 * workers file dang xu ly de bo nho khong tang theo kich thuoc corpus
+    if workers <= 1 or len(files) <= 1:
+        for rel in files:
+            yield load_and_split(rel)
+        return
+
+    files = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(load_and_split, rel) for rel in islice(files, 2 * workers)}
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                rel = next(files, None)
+                if rel is not None:
+                    futures.add(executor.submit(load_and_split, rel))
+
+def chunk_id(rel: str, digest: str, i: int) -> str:
+    # Split co dinh nen cung file + cung hash luon cho ra cung ID, dung de resume
+    return f"{rel}::{digest[:12]}::{i}"
+
+def iter_file_chunks(files, hashes: dict, workers: int):
+    for rel, chunks in iter_split_files(files, workers):
+        yield rel, [chunk_id(rel, hashes[rel], i) for i in range(len(chunks))], chunks
+
+def chunk_source(cid: str) -> str:
+    return cid.rsplit("::", 2)[0]
+
+def iter_unique_chunks(file_chunks, dedup: NearDuplicateFilter, stats: dict, keep_ids=frozenset()):
+    # Bo cac chunk gan trung voi chunk da co (trong index hoac vua gap) truoc khi embed.
+    # Chunk trong keep_ids da nam trong index tu lan build truoc nen luon duoc giu.
+    # stats["duplicate_of"][file] ghi lai cac file chua ban giu lai cua chunk bi bo
+    for rel, chunk_ids, chunks in file_chunks:
+        kept_ids, kept_chunks = [], []
+        for cid, doc in zip(chunk_ids, chunks):
+            fp = simhash(doc.page_content)
+            match = None if cid in keep_ids else dedup.find(fp)
+            if match is not None:
+                stats["dropped"] += 1
+                stats["chars"] += len(doc.page_content)
+                if chunk_source(match) != rel:
+                    stats["duplicate_of"].setdefault(rel, set()).add(chunk_source(match))
+                continue
+            dedup.add(cid, fp)
+            kept_ids.append(cid)
+            kept_chunks.append(doc)
+        yield rel, kept_ids, kept_chunks
+
+def iter_batches(file_chunks, batch_size: int, skip_ids=frozenset()):
+    # Gom chunk cua nhieu file thanh batch (file, id, doc) co kich thuoc co dinh, kem
+    # cac file ma tat ca chunk da nam trong batch nay hoac cac batch truoc
+    batch, completed = [], {}
+    for rel, chunk_ids, chunks in file_chunks:
+        for cid, doc in zip(chunk_ids, chunks):
+            if cid in skip_ids:
+                continue
+            batch.append((rel, cid, doc))
+            if len(batch) == batch_size:
+                yield batch, completed
+                batch, completed = [], {}
+        completed[rel] = chunk_ids
+    if batch or completed:
+        yield batch, completed
+
+def add_batch(stores: dict, embeddings, batch):
+    # Embed ca batch mot lan roi chia vector ve shard cua tung file
+    texts = [doc.page_content for _, _, doc in batch]
+    by_shard = {}
+    for (rel, cid, doc), vector in zip(batch, embeddings.embed_documents(texts)):
+        by_shard.setdefault(shard_for(rel), []).append((cid, doc, vector))
+
+    for shard, items in by_shard.items():
+        text_embeddings = [(doc.page_content, vector) for _, doc, vector in items]
+        metadatas = [doc.metadata for _, doc, _ in items]
+        ids = [cid for cid, _, _ in items]
+        if stores.get(shard) is None:
+            stores[shard] = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+        else:
+            stores[shard].add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    return set(by_shard)
+
+def index_params() -> dict:
+    # Thay doi mot trong cac tham so nay thi cac vector cu khong con dung nua
+    params = {
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "chunk_size": settings.CHUNK_SIZE,
+        "chunk_overlap": settings.CHUNK_OVERLAP,
+        "shard_by": settings.SHARD_BY,
+        "num_shards": settings.NUM_SHARDS if settings.SHARD_BY == "hash" else None,
+    }
+    # Vector int8 lech nhe so voi torch nen doi backend thi build lai; torch giu manifest cu
+    if settings.EMBEDDING_BACKEND != "torch":
+        quantized = settings.EMBEDDING_BACKEND == "onnx" and settings.ONNX_QUANTIZE
+        params["embedding_backend"] = settings.EMBEDDING_BACKEND + ("-int8" if quantized else "")
+    return params
+
+def manifest_path(path: str) -> str:
+    return os.path.join(path, settings.MANIFEST_FILE)
+
+def load_manifest(path: str):
+    if not os.path.exists(manifest_path(path)):
+        return None
+    with open(manifest_path(path), encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, path: str):
+    tmp_path = manifest_path(path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path(path))
+
+def save_vectorstore(vectorstore, path: str):
+    # Ghi ra thu muc tam roi doi ten de file index luon day du
+    os.makedirs(path, exist_ok=True)
+    tmp_dir = os.path.join(path, ".tmp")
+    vectorstore.save_local(tmp_dir)
+    for name in ("index.faiss", "index.pkl"):
+        os.replace(os.path.join(tmp_dir, name), os.path.join(path, name))
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def link_shard(source: str, target: str):
+    # Shard khong doi thi hard link file tu version cu, khong ton dung luong hay thoi gian copy.
+    # File luon duoc ghi moi bang os.replace nen version cu khong bi sua theo
+    os.makedirs(target, exist_ok=True)
+    for name in os.listdir(source):
+        if not (name.startswith("index.") or name in (DOCSTORE_FILE, BM25_FILE, VECTORS_FILE)):
+            continue
+        src, dst = os.path.join(source, name), os.path.join(target, name)
+        if os.path.exists(dst) or not os.path.isfile(src):
+            continue
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+def save_shards(stores: dict, dirty: set, manifest: dict, source: str, build_path: str):
+    # Manifest ghi sau cung nen build bi crash giua chung van de lai index + manifest khop nhau
+    for shard, vectorstore in stores.items():
+        if shard in dirty:
+            save_vectorstore(vectorstore, shard_path(build_path, shard))
+        elif source != build_path:
+            link_shard(shard_path(source, shard), shard_path(build_path, shard))
+    manifest["shards"] = sorted(stores)
+    save_manifest(manifest, build_path)
+
+def finalize_shard(vectorstore, path: str, dirty: bool):
+    # Docstore SQLite cho app load lazy thay vi unpickle index.pkl
+    if dirty or not os.path.exists(os.path.join(path, DOCSTORE_FILE)):
+        write_sqlite_docstore(vectorstore, path)
+
+    # Inverted index BM25 cho retriever hybrid, cung vi tri vector voi FAISS
+    if dirty or not os.path.exists(os.path.join(path, BM25_FILE)):
+        write_bm25_index(vectorstore, path)
+
+    # Vector chuan hoa lien tuc cho MMR vector hoa o rag_service
+    if dirty or not os.path.exists(os.path.join(path, VECTORS_FILE)):
+        write_vectors(vectorstore, path)
+
+    # index.faiss (flat) la ban goc de cap nhat incremental; index serving
+    # (HNSW/IVF/nen) duoc tao lai tu no moi khi noi dung thay doi
+    if settings.INDEX_TYPE == "flat" and settings.INDEX_STORAGE == "float32":
+        return
+    fallback = os.path.join(path, serving_fallback_name())
+    if dirty or not (os.path.exists(os.path.join(path, serving_index_name())) or os.path.exists(fallback)):
+        try:
+            save_serving_index(vectorstore.index, path)
+        except ValueError as e:
+            print(f"Khong tao duoc index {settings.INDEX_TYPE} cho {path}: {e}. App se dung index flat")
+            # Ghi lai de lan build sau khong coi shard la chua xong roi build + publish lai
+            with open(fallback, "w", encoding="utf-8") as f:
+                f.write(str(e))
+        else:
+            if os.path.exists(fallback):
+                os.remove(fallback)
+
+def shard_complete(path: str) -> bool:
+    serving = settings.INDEX_TYPE != "flat" or settings.INDEX_STORAGE != "float32"
+    return (
+        os.path.exists(os.path.join(path, DOCSTORE_FILE))
+        and os.path.exists(os.path.join(path, BM25_FILE))
+        and os.path.exists(os.path.join(path, VECTORS_FILE))
+        and (
+            not serving
+            or os.path.exists(os.path.join(path, serving_index_name()))
+            or os.path.exists(os.path.join(path, serving_fallback_name()))
+        )
     )
 
-    # Tạo vector store
-    vectorstore = FAISS.from_documents(texts, embeddings)
-    vectorstore.save_local(settings.VECTORSTORE_PATH)
+def process_documents(
+    full_rebuild: bool = False,
+    workers: int = None,
+    batch_size: int = None,
+    flush_every: int = None,
+    dedup: bool = None,
+    only_shard: str = None,
+):
+    workers = workers or settings.INGEST_WORKERS
+    batch_size = batch_size or settings.EMBED_BATCH_SIZE
+    flush_every = settings.FLUSH_EVERY if flush_every is None else flush_every
+    dedup = settings.DEDUP_ENABLED if dedup is None else dedup
+    embeddings = get_embeddings(batch_size)
+
+    # Doc tu version dang chay, ghi vao mot version moi; app chi thay version moi khi
+    # build xong va CURRENT duoc doi. Lan build truoc bi crash thi ghi tiep vao version do
+    build_version = unpublished_version()
+    if build_version and load_manifest(version_path(build_version)) is not None:
+        source = version_path(build_version)
+    else:
+        source = active_path()
+    build_version = build_version or new_version()
+    build_path = version_path(build_version)
+
+    manifest = None if full_rebuild and only_shard is None else load_manifest(source)
+    if manifest is None or manifest.get("params") != index_params():
+        if not full_rebuild:
+            print("Khong co manifest hop le, tao lai toan bo vectorstore")
+        manifest = {"params": index_params(), "files": {}, "pending": {}}
+    indexed = manifest["files"]
+    # "pending" la cac file moi embed duoc mot phan o lan build truoc (bi crash sau mot lan flush)
+    pending = manifest.setdefault("pending", {})
+
+    # Moi shard la mot vectorstore doc lap; "" la vectorstore khong chia shard
+    stores = {}
+    for shard in manifest.get("shards", [""] if indexed else []):
+        if os.path.exists(f"{shard_path(source, shard)}/index.faiss"):
+            stores[shard] = FAISS.load_local(
+                shard_path(source, shard), embeddings, allow_dangerous_deserialization=True
+            )
+    # File rong/bi dedup het khong co chunk nao nen shard cua no co the khong co index
+    if any(
+        entry["ids"] and entry.get("shard", "") not in stores
+        for entry in list(indexed.values()) + list(pending.values())
+    ):
+        print("Thieu index cua mot so shard, tao lai toan bo vectorstore")
+        stores = {}
+        indexed.clear()
+        pending.clear()
+
+    def in_scope(rel):
+        return only_shard is None or shard_for(rel) == only_shard
+
+    if full_rebuild and only_shard is not None:
+        # Chi build lai mot shard: bo manifest + index cua shard do, cac shard khac giu nguyen
+        for files in (indexed, pending):
+            for rel in [rel for rel, entry in files.items() if entry.get("shard", "") == only_shard]:
+                del files[rel]
+        stores.pop(only_shard, None)
 
-    print(f"Da xu ly {len(texts)} chunks tu {len(documents)} tai lieu")
+    # So sanh hash tung file voi manifest de biet file nao moi/thay doi/bi xoa
+    current = {
+        rel: file_hash(os.path.join(settings.DATA_PATH, rel))
+        for rel in discover_files() if in_scope(rel)
+    }
+    removed = [rel for rel in indexed if rel not in current and in_scope(rel)]
+    changed = [rel for rel, digest in current.items() if indexed.get(rel, {}).get("hash") != digest]
+    # File co chunk bi bo vi trung voi file vua bi xoa/thay doi thi phai xu ly lai,
+    # neu khong noi dung do se mat khoi index
+    invalid = set(removed) | set(changed)
+    while True:
+        dependents = [
+            rel for rel, entry in indexed.items()
+            if rel not in invalid and invalid.intersection(entry.get("duplicate_of", []))
+        ]
+        if not dependents:
+            break
+        invalid.update(dependents)
+        for rel in dependents:
+            path = os.path.join(settings.DATA_PATH, rel)
+            if os.path.exists(path):
+                current.setdefault(rel, file_hash(path))
+                changed.append(rel)
+            else:
+                removed.append(rel)
+    unchanged = len(current) - len(changed)
+
+    stale = [indexed.pop(rel) for rel in removed + changed if rel in indexed]
+    for rel, entry in list(pending.items()):
+        if rel in current and current[rel] != entry["hash"] or rel not in current and in_scope(rel):
+            stale.append(pending.pop(rel))
+    dirty = set()
+    for entry in stale:
+        if entry["ids"]:
+            shard = entry.get("shard", "")
+            stores[shard].delete(entry["ids"])
+            dirty.add(shard)
+    n_stale = sum(len(entry["ids"]) for entry in stale)
+
+    # Nap lai fingerprint cua cac chunk con trong index de so trung voi chunk moi
+    dedup_filter = NearDuplicateFilter(settings.DEDUP_MAX_DISTANCE)
+    for entry in indexed.values():
+        for cid, fp in zip(entry["ids"], entry.get("fingerprints", [])):
+            dedup_filter.add(cid, fp)
+    dedup_stats = {"dropped": 0, "chars": 0, "duplicate_of": {}}
+
+    resumed_ids = {cid for entry in pending.values() for cid in entry["ids"]}
+    if resumed_ids:
+        print(f"Tiep tuc lan build truoc: bo qua {len(resumed_ids)} chunks da embed")
+    dirty.update(entry.get("shard", "") for entry in pending.values())
+
+    # Pipeline generator: worker doc/chia nho file -> gom batch -> embed -> them vao FAISS.
+    # Khong giu toan bo documents/chunks trong bo nho, va cu moi flush_every chunks
+    # thi ghi vectorstore + manifest xuong dia de build bi crash co the chay tiep
+    start = time.perf_counter()
+    n_chunks = since_flush = 0
+    file_chunks = iter_file_chunks(changed, current, workers)
+    if dedup:
+        file_chunks = iter_unique_chunks(file_chunks, dedup_filter, dedup_stats, resumed_ids)
+    for batch, completed in iter_batches(file_chunks, batch_size, resumed_ids):
+        if batch:
+            dirty.update(add_batch(stores, embeddings, batch))
+        for rel, cid, _ in batch:
+            entry = pending.setdefault(rel, {"hash": current[rel], "shard": shard_for(rel), "ids": []})
+            entry["ids"].append(cid)
+        for rel, chunk_ids in completed.items():
+            pending.pop(rel, None)
+            indexed[rel] = {"hash": current[rel], "shard": shard_for(rel), "ids": chunk_ids}
+            if dedup:
+                indexed[rel]["fingerprints"] = [dedup_filter.fingerprints[cid] for cid in chunk_ids]
+                indexed[rel]["duplicate_of"] = sorted(dedup_stats["duplicate_of"].get(rel, ()))
+
+        n_chunks += len(batch)
+        since_flush += len(batch)
+        if flush_every and since_flush >= flush_every:
+            save_shards(stores, dirty, manifest, source, build_path)
+            since_flush = 0
+    elapsed = time.perf_counter() - start
+
+    if not stores:
+        print(f"Khong tim thay tai lieu nao trong {settings.DATA_PATH}/")
+        return
+
+    complete = all(shard in dirty or shard_complete(shard_path(source, shard)) for shard in stores)
+    # File khong co chunk bi xoa/thay doi chi lam doi manifest, van phai publish
+    if dirty or stale or changed or source == build_path or not complete:
+        save_shards(stores, dirty, manifest, source, build_path)
+        for shard, vectorstore in stores.items():
+            finalize_shard(vectorstore, shard_path(build_path, shard), shard in dirty)
+
+        publish(build_version)
+        removed_versions = gc_versions()
+        print(f"Da publish version {build_version}" + (f", xoa {len(removed_versions)} version cu" if removed_versions else ""))
+    else:
+        print("Vectorstore khong thay doi")
+
+    ntotal = sum(vectorstore.index.ntotal for vectorstore in stores.values())
+    print(f"Da xu ly {n_chunks} chunks tu {len(changed)} tai lieu "
+          f"(giu nguyen {unchanged}, xoa {len(removed)}, tong {ntotal} vectors trong {len(stores)} shard)")
+    if dedup_stats["dropped"]:
+        dim = next(iter(stores.values())).index.d
+        vector_bytes = dedup_stats["dropped"] * dim * 4
+        print(f"Bo {dedup_stats['dropped']} chunks gan trung lap: tiet kiem "
+              f"{vector_bytes / 1024:.1f} KB vector, {dedup_stats['chars']} ky tu text")
+    if changed and elapsed > 0:
+        print(f"Thoi gian {elapsed:.1f}s voi {workers} workers, batch {batch_size}: "
+              f"{len(changed) / elapsed:.2f} docs/s, {n_chunks / elapsed:.1f} chunks/s")
 
 if __name__ == "__main__":
-    process_documents()
+    parser = argparse.ArgumentParser(description="Tao/cap nhat vectorstore tu thu muc data")
+    parser.add_argument("--full", action="store_true", help="Bo qua manifest va tao lai toan bo vectorstore")
+    parser.add_argument("--workers", type=int, help="So process doc/chia nho file (mac dinh INGEST_WORKERS)")
+    parser.add_argument("--batch-size", type=int, help="So chunk moi batch embedding (mac dinh EMBED_BATCH_SIZE)")
+    parser.add_argument("--flush-every", type=int, help="Ghi vectorstore xuong dia sau moi N chunks (0 = chi ghi khi xong)")
+    parser.add_argument("--no-dedup", action="store_true", help="Khong loai bo chunk gan trung lap")
+    parser.add_argument("--shard", help="Chi cap nhat (hoac voi --full: build lai) mot shard")
+    args = parser.parse_args()
+    process_documents(
+        full_rebuild=args.full,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        flush_every=args.flush_every,
+        dedup=False if args.no_dedup else None,
+        only_shard=args.shard,
+    )
@@ -0,0 +1,18 @@
+"""Chay app Streamlit va bat dau warm-up ngay khi process khoi dong:
+
+    python -m src.serve --server.port=8501 --server.address=0.0.0.0
+
+`streamlit run src/main.py` chi chay script khi co session dau tien, nen model,
+index va /ready (METRICS_PORT) chi san sang sau khi co nguoi truy cap.
+"""
+import sys
+
+from streamlit.web import cli as stcli
+
+from src.services.rag_service import get_warmup
+
+if __name__ == "__main__":
+    # Cung process voi Streamlit nen main.py dung lai cac resource da warm-up
+    get_warmup()
+    sys.argv = ["streamlit", "run", "src/main.py", *sys.argv[1:]]
+    sys.exit(stcli.main())
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.services import metrics
+from src.services.tracing import span
+
+OVERLOADED_MESSAGE = "Hệ thống đang có nhiều người hỏi cùng lúc, bạn vui lòng thử lại sau ít phút nhé."
+
+class Rejected(Exception):
+    """Khong nhan them request; message hien thi duoc cho nguoi dung."""
+
+    def __init__(self, reason: str, message: str = OVERLOADED_MESSAGE):
+        super().__init__(message)
+        self.reason = reason
+
+class AdmissionController:
+    """Gioi han so cau tra loi dang sinh dong thoi trong pod, phan con lai xep hang FIFO.
+
+    Hang doi day, hoac thoi gian cho uoc tinh (vi tri / max_in_flight * thoi gian
+    tra loi trung binh) vuot max_wait, thi tu choi ngay thay vi de nguoi dung cho
+    roi moi bao loi. Request da xep hang ma cho qua max_wait cung bi tu choi.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queue = deque()
+        self._service_time = None  # EWMA thoi gian giu slot
+
+        self._wait_hist = metrics.histogram(
+            "rag_admission_wait_seconds", "Thoi gian cho trong hang doi truoc khi duoc sinh cau tra loi",
+            buckets=(0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 30, 60),
+        )
+        self._admitted = metrics.counter("rag_admission_admitted_total", "So request duoc nhan")
+        self._rejected = metrics.counter("rag_admission_rejected_total", "So request bi tu choi", labels=("reason",))
+        metrics.gauge("rag_admission_in_flight", "So cau tra loi dang sinh", fn=lambda: self._in_flight)
+        metrics.gauge("rag_admission_queue_depth", "So request dang xep hang", fn=lambda: len(self._queue))
+        metrics.gauge("rag_admission_max_in_flight", "Gioi han so cau tra loi dong thoi", fn=lambda: self.max_in_flight)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _reject(self, reason: str):
+        self._rejected.inc(reason=reason)
+        raise Rejected(reason)
+
+    def _expected_wait(self, position: int) -> float:
+        if self._service_time is None:
+            return 0.0
+        return position / self.max_in_flight * self._service_time
+
+    def acquire(self, on_position=None):
+        """Cho toi luot; on_position(vi tri) duoc goi moi khi vi tri trong hang doi thay doi."""
+        start = time.monotonic()
+        with self._cond:
+            if self._in_flight < self.max_in_flight and not self._queue:
+                self._in_flight += 1
+                self._admitted.inc()
+                self._wait_hist.observe(0.0)
+                return
+            if len(self._queue) >= self.max_queue:
+                self._reject("queue_full")
+            if self._expected_wait(len(self._queue) + 1) > self.max_wait:
+                self._reject("deadline")
+            ticket = object()
+            self._queue.append(ticket)
+
+        deadline = start + self.max_wait
+        last_position = None
+        try:
+            while True:
+                with self._cond:
+                    position = self._queue.index(ticket) + 1
+                    if position == 1 and self._in_flight < self.max_in_flight:
+                        self._queue.popleft()
+                        self._in_flight += 1
+                        self._admitted.inc()
+                        self._wait_hist.observe(time.monotonic() - start)
+                        self._cond.notify_all()
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._queue.remove(ticket)
+                        self._cond.notify_all()
+                        self._reject("timeout")
+                    if position == last_position:
+                        self._cond.wait(min(remaining, 1.0))
+                        continue
+                # Callback (vd cap nhat UI) goi ngoai lock
+                last_position = position
+                if on_position is not None:
+                    on_position(position)
+        except BaseException:
+            # Callback bi ngat (vd Streamlit rerun/stop khi dang xep hang) thi phai bo ve,
+            # neu khong ve nay nam mai o dau hang doi va moi request sau bi timeout
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                self._cond.notify_all()
+            raise
+
+    def release(self, held: float = None):
+        with self._cond:
+            self._in_flight -= 1
+            if held is not None:
+                self._service_time = held if self._service_time is None else 0.8 * self._service_time + 0.2 * held
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, on_position=None):
+        with span("queue_wait"):
+            self.acquire(on_position)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
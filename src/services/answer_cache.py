@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from src.services import metrics
+from src.services.mmr import normalize
+
+class AnswerCache:
+    """Cache cau tra loi theo cau hoi da normalize_query, luu trong SQLite.
+
+    Trung key thi tra ngay; khong trung thi so cosine voi embedding cac cau hoi
+    da cache, tu threshold tro len coi la cung cau hoi. Moi entry gan voi version
+    vectorstore luc tra loi va chi dung lai cho dung version do, vi context da khac.
+    Nhieu pod dung chung file co the dang o version khac nhau (luc rollout), nen
+    entry cua version cu khong bi xoa ngay ma het han theo TTL/LRU.
+    """
+
+    def __init__(self, path: str, embeddings, max_entries: int = 1000, ttl: float = 86400, threshold: float = 0.95):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # App va API dung chung file cache: autocommit de khong giu write lock giua cac
+        # lan goi, WAL de doc khong bi chan boi ghi, timeout de cho thay vi loi "database is locked"
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Khoa theo (key, version): cac pod o version khac nhau khong ghi de cau tra loi cua nhau
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cached_answers ("
+            "key TEXT, version TEXT, answer TEXT, vector BLOB, created REAL, last_used REAL, "
+            "PRIMARY KEY (key, version))"
+        )
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys, self._vectors = [], None
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0}
+
+        metrics.counter("rag_answer_cache_hits_total", "So cau hoi trung key trong cache", fn=lambda: self._stats["hits"])
+        metrics.counter(
+            "rag_answer_cache_near_hits_total", "So cau hoi dung lai cau tra loi cua cau hoi gan giong",
+            fn=lambda: self._stats["near_hits"],
+        )
+        metrics.counter("rag_answer_cache_misses_total", "So cau hoi khong co trong cache", fn=lambda: self._stats["misses"])
+        metrics.gauge("rag_answer_cache_entries", "So cau tra loi dang duoc cache", fn=lambda: len(self._keys))
+
+    def _load_index(self):
+        rows = self.conn.execute("SELECT key, vector FROM cached_answers WHERE version = ?", (self._version,)).fetchall()
+        self._keys = [key for key, _ in rows]
+        self._vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]) if rows else None
+
+    def _sync(self, version: str):
+        # Goi trong self._lock: bo entry het han, doi version thi nap lai vector cua version moi
+        changed = False
+        if version != self._version:
+            self._version = version
+            changed = True
+        expired = self.conn.execute("DELETE FROM cached_answers WHERE created < ?", (time.time() - self.ttl,))
+        changed |= expired.rowcount > 0
+        if changed:
+            self._load_index()
+
+    def _hit(self, key: str):
+        where = "WHERE key = ? AND version = ?"
+        row = self.conn.execute(f"SELECT answer FROM cached_answers {where}", (key, self._version)).fetchone()
+        if row is not None:
+            self.conn.execute(f"UPDATE cached_answers SET last_used = ? {where}", (time.time(), key, self._version))
+        return row[0] if row else None
+
+    def _embed(self, key: str) -> np.ndarray:
+        return normalize(np.asarray(self.embeddings.embed_query(key), dtype=np.float32))
+
+    def get(self, key: str, version: str):
+        version = version or ""
+        with self._lock:
+            self._sync(version)
+            answer = self._hit(key)
+            if answer is not None or self._vectors is None or self.threshold >= 1:
+                self._stats["hits" if answer is not None else "misses"] += 1
+                return answer
+
+        # Embed ngoai lock; query embedding da duoc cache nen thuong rat nhanh
+        vector = self._embed(key)
+        with self._lock:
+            self._sync(version)
+            if self._vectors is not None:
+                sims = self._vectors @ vector
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    answer = self._hit(self._keys[best])
+            self._stats["near_hits" if answer is not None else "misses"] += 1
+            return answer
+
+    def put(self, key: str, answer: str, version: str):
+        version = version or ""
+        vector = self._embed(key)
+        now = time.time()
+        with self._lock:
+            self._sync(version)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cached_answers VALUES (?, ?, ?, ?, ?, ?)",
+                (key, version, answer, vector.astype(np.float32).tobytes(), now, now),
+            )
+            # LRU: vuot max_entries thi xoa entry lau nhat chua duoc dung
+            self.conn.execute(
+                "DELETE FROM cached_answers WHERE rowid IN ("
+                "SELECT rowid FROM cached_answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._load_index()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._keys)
+        return stats
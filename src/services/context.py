@@ -0,0 +1,118 @@
+import re
+
+from src.services.history import count_tokens, truncate_tokens
+
+# Doan trung toi thieu (ky tu) de coi hai chunk la noi tiep nhau khi khong co start_index
+MIN_OVERLAP = 20
+# Dong ngan hon (tieu de, gach dau dong) co the lap lai hop le nen khong dedup
+MIN_DEDUP_LINE = 30
+
+class _Block:
+    def __init__(self, doc, rank: int):
+        self.text = doc.page_content
+        self.rank = rank
+        self.start = doc.metadata.get("start_index")
+        self.end = None if self.start is None else self.start + len(self.text)
+
+def _group_key(doc):
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+def _splice(a: str, b: str):
+    # Tra ve a + phan con lai cua b neu cuoi a trung dau b, nguoc lai None
+    if b in a:
+        return a
+    probe = b[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return None
+    idx = a.find(probe)
+    while idx != -1:
+        if b.startswith(a[idx:]):
+            return a[:idx] + b
+        idx = a.find(probe, idx + 1)
+    return None
+
+def _merge_positioned(blocks):
+    # Chunk cung trang co start_index: sap theo vi tri, noi cac chunk chong len hoac sat nhau
+    blocks = sorted(blocks, key=lambda b: b.start)
+    merged = [blocks[0]]
+    for block in blocks[1:]:
+        last = merged[-1]
+        if block.start > last.end + 2:
+            merged.append(block)
+            continue
+        if block.end > last.end:
+            tail = block.text[max(0, last.end - block.start):]
+            last.text += ("\n" if block.start > last.end else "") + tail
+            last.end = block.end
+        last.rank = min(last.rank, block.rank)
+    return merged
+
+def _merge_by_text(blocks):
+    # Vectorstore cu chua co start_index: tim doan trung giua cuoi chunk nay va dau chunk kia.
+    # Lap lai toi khi khong gop them duoc (chunk 1 va 3 chi noi nhau qua chunk 2)
+    while True:
+        merged = _merge_once(blocks)
+        if len(merged) == len(blocks):
+            return merged
+        blocks = merged
+
+def _merge_once(blocks):
+    merged = []
+    for block in blocks:
+        for other in merged:
+            text = _splice(other.text, block.text) or _splice(block.text, other.text)
+            if text is not None:
+                other.text = text
+                other.rank = min(other.rank, block.rank)
+                break
+        else:
+            merged.append(block)
+    return merged
+
+def _dedup_lines(text: str, seen: set) -> str:
+    lines = []
+    for line in text.split("\n"):
+        key = re.sub(r"\s+", " ", line).strip().lower()
+        if len(key) >= MIN_DEDUP_LINE:
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+def pack_context(docs, budget: int):
+    """Gop chunk theo nguon/vi tri, bo doan lap lai va xep theo do lien quan vao ngan sach token.
+
+    docs theo thu tu retriever tra ve (lien quan nhat truoc). Tra ve (context, so token
+    neu noi thang page_content, so token sau khi gop).
+    """
+    raw_tokens = count_tokens("\n\n".join(doc.page_content for doc in docs))
+    groups = {}
+    for rank, doc in enumerate(docs):
+        groups.setdefault(_group_key(doc), []).append(_Block(doc, rank))
+
+    blocks = []
+    for group in groups.values():
+        if all(block.start is not None for block in group):
+            blocks.extend(_merge_positioned(group))
+        else:
+            blocks.extend(_merge_by_text(group))
+    blocks.sort(key=lambda b: b.rank)
+
+    parts, used, seen = [], 0, set()
+    for block in blocks:
+        text = _dedup_lines(block.text, seen)
+        if not text:
+            continue
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            # Khoi lien quan nhat con lai bi cat cho vua, cac khoi sau bo
+            text = truncate_tokens(text, budget - used)
+            if text:
+                parts.append(text)
+            break
+        parts.append(text)
+        used += tokens
+
+    context = "\n\n".join(parts)
+    return context, raw_tokens, count_tokens(context)
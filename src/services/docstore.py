@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.config import settings
+from src.services.vector_index import apply_search_params, serving_index_name
+
+DOCSTORE_FILE = "docstore.sqlite"
+
+class _SQLiteReader:
+    # Moi thread (session Streamlit) mot connection chi doc
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+class SQLiteDocstore(Docstore):
+    """Docstore chi doc, lay noi dung chunk tu SQLite theo ID khi can thay vi unpickle ca corpus."""
+
+    def __init__(self, path: str):
+        self._reader = _SQLiteReader(path)
+
+    def search(self, search: str):
+        row = self._reader.conn.execute(
+            "SELECT content, metadata FROM chunks WHERE id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+class SQLiteIndexMap(Mapping):
+    """Vi tri vector trong FAISS -> ID chunk, doc tu SQLite thay vi giu dict trong RAM."""
+
+    def __init__(self, path: str):
+        self._reader = _SQLiteReader(path)
+        self._len = None
+
+    def __getitem__(self, pos):
+        row = self._reader.conn.execute("SELECT id FROM chunks WHERE pos = ?", (int(pos),)).fetchone()
+        if row is None:
+            raise KeyError(pos)
+        return row[0]
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self._reader.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return self._len
+
+    def __iter__(self):
+        for (pos,) in self._reader.conn.execute("SELECT pos FROM chunks ORDER BY pos"):
+            yield pos
+
+def write_sqlite_docstore(vectorstore, path: str):
+    # Ghi lai toan bo vi FAISS don vi tri vector sau moi lan xoa
+    target = os.path.join(path, DOCSTORE_FILE)
+    tmp_path = target + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute(
+        "CREATE TABLE chunks (pos INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+        "content TEXT NOT NULL, metadata TEXT NOT NULL)"
+    )
+    rows = (
+        (pos, cid, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+        for pos, cid in vectorstore.index_to_docstore_id.items()
+        for doc in [vectorstore.docstore.search(cid)]
+    )
+    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, target)
+    return target
+
+def read_index_mmap(index_path: str):
+    # mmap phan luu vector thay vi doc vao RAM, cac pod tren cung node dung chung page cache
+    return faiss.read_index(index_path, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP))
+
+def load_compact_vectorstore(path: str, embeddings):
+    """Load vectorstore voi index mmap va docstore SQLite, thoi gian khong phu thuoc kich thuoc corpus."""
+    index_map = SQLiteIndexMap(os.path.join(path, DOCSTORE_FILE))
+
+    flat_path = os.path.join(path, "index.faiss")
+    index = None
+    if settings.INDEX_TYPE != "flat" or settings.INDEX_STORAGE != "float32":
+        serving_path = os.path.join(path, serving_index_name())
+        if not os.path.exists(serving_path):
+            print(f"Khong tim thay {serving_path}, dung index flat")
+        else:
+            index = read_index_mmap(serving_path)
+            if index.ntotal != len(index_map):
+                print(f"{serving_path} khong khop voi docstore, dung index flat")
+                index = None
+    if index is None:
+        index = read_index_mmap(flat_path)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=apply_search_params(index),
+        docstore=SQLiteDocstore(os.path.join(path, DOCSTORE_FILE)),
+        index_to_docstore_id=index_map,
+    )
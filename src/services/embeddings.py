@@ -0,0 +1,102 @@
+import os
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.config import settings
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+def onnx_model_file(path: str, quantize: bool) -> str:
+    return os.path.join(path, ONNX_INT8_FILE if quantize else ONNX_MODEL_FILE)
+
+class OnnxEmbeddings(Embeddings):
+    """Embed bang model ONNX da export (src/export_onnx.py), khong can torch luc chay.
+
+    Mean pooling tren last_hidden_state theo attention mask, giong SentenceTransformer
+    cua paraphrase-multilingual-MiniLM-L12-v2, nen vector dung chung duoc voi backend torch.
+    """
+
+    def __init__(self, path: str, quantize: bool = True, batch_size: int = 32, max_length: int = 128):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = settings.ONNX_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            onnx_model_file(path, quantize), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [self._embed(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(batches).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+class HashEmbeddings(Embeddings):
+    """Vector tu hash cac tu (feature hashing), khong can model hay mang.
+
+    Chi dung cho benchmark/CI offline: cau co chung tu thi gan nhau, nhung khong
+    hieu nghia nhu model that.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            h = zlib.crc32(word.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+def get_embeddings(batch_size: int = None, backend: str = None):
+    # Dung chung cho process_docs.py va rag_service.py de hai ben luon embed giong nhau
+    backend = backend or settings.EMBEDDING_BACKEND
+    batch_size = batch_size or settings.EMBED_BATCH_SIZE
+    if backend == "onnx":
+        return OnnxEmbeddings(settings.ONNX_MODEL_PATH, quantize=settings.ONNX_QUANTIZE, batch_size=batch_size)
+    if backend == "hash":
+        return HashEmbeddings()
+    if backend != "torch":
+        raise ValueError(f"EMBEDDING_BACKEND khong hop le: {backend} (torch | onnx | hash)")
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        cache_folder=settings.CACHE_FOLDER,
+        encode_kwargs={"batch_size": batch_size},
+    )
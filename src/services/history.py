@@ -0,0 +1,67 @@
+import re
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    # Uoc luong: moi tu / dau cau ~ 1 token, du de chia ngan sach, khong can tokenizer cua LLM
+    return len(_TOKEN_RE.findall(text))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    matches = list(_TOKEN_RE.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    if max_tokens == 1:
+        return text[:matches[0].end()]
+    # "…" cung tinh la mot token
+    return text[:matches[max_tokens - 2].end()] + " …"
+
+def format_turn(message: dict) -> str:
+    return f"{message['role'].upper()}: {message['content']}"
+
+def build_history(messages, budget: int, summary_budget: int) -> str:
+    """Lich su vua ngan sach token: cac luot gan nhat giu nguyen van, luot cu hon
+    chi con cau hoi cua nguoi dung (toi da summary_budget token), con lai bo di.
+    """
+    recent, used, cut = [], 0, len(messages)
+    for message in reversed(messages):
+        turn = format_turn(message)
+        tokens = count_tokens(turn)
+        if used + tokens > budget:
+            if not recent:
+                # Luot moi nhat qua dai thi cat bot thay vi bo han
+                recent.append(truncate_tokens(turn, budget))
+                cut -= 1
+            break
+        recent.append(turn)
+        used += tokens
+        cut -= 1
+
+    # Cac cau hoi cu gan nhat duoc uu tien, cau qua dai so voi phan con lai thi bo
+    older, used = [], 0
+    for message in reversed(messages[:cut]):
+        tokens = count_tokens(message["content"])
+        if message["role"] != "user" or used + tokens > summary_budget:
+            continue
+        older.append(message["content"])
+        used += tokens
+
+    parts = []
+    if older:
+        parts.append(f"Các câu hỏi trước đó: {'; '.join(reversed(older))}")
+    parts.extend(reversed(recent))
+    return "\n".join(parts)
+
+def retrieval_query(messages, question: str, followup_tokens: int, max_tokens: int) -> str:
+    """Query de embed/search chi tu luot moi nhat, do dai khong doi theo lich su.
+
+    Cau hoi ngan (thuong la hoi tiep: "con cai do thi sao?") duoc ghep them cau
+    hoi truoc cua nguoi dung de con ngu canh.
+    """
+    query = question
+    if count_tokens(question) <= followup_tokens:
+        previous = next((m["content"] for m in reversed(messages) if m["role"] == "user"), None)
+        if previous:
+            query = f"{truncate_tokens(previous, max_tokens - count_tokens(question))} {question}"
+    return truncate_tokens(query, max_tokens)
@@ -0,0 +1,134 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Any
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+from src.config import settings
+from src.services.tracing import span
+
+BM25_FILE = "bm25.sqlite"
+
+def tokenize(text: str):
+    # \w cua Python nhan ca chu tieng Viet co dau; giu nguyen ma nhu ec2, s3, 2.1 -> 2, 1
+    return re.findall(r"\w+", text.lower())
+
+def write_bm25_index(vectorstore, path: str):
+    """Tao inverted index BM25 cho cac chunk trong vectorstore, theo dung vi tri vector FAISS."""
+    postings = defaultdict(lambda: ([], []))
+    doc_lengths = np.zeros(len(vectorstore.index_to_docstore_id), dtype=np.int32)
+    for pos, cid in vectorstore.index_to_docstore_id.items():
+        tokens = tokenize(vectorstore.docstore.search(cid).page_content)
+        doc_lengths[pos] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            postings[term][0].append(pos)
+            postings[term][1].append(tf)
+
+    target = os.path.join(path, BM25_FILE)
+    tmp_path = target + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value BLOB)")
+    conn.execute("CREATE TABLE postings (term TEXT PRIMARY KEY, positions BLOB, tfs BLOB)")
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("stats", json.dumps({"n_docs": len(doc_lengths), "avg_len": float(doc_lengths.mean()) if len(doc_lengths) else 0.0})),
+        ("doc_lengths", doc_lengths.tobytes()),
+    ])
+    conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", (
+        (term, np.array(positions, dtype=np.int32).tobytes(), np.array(tfs, dtype=np.float32).tobytes())
+        for term, (positions, tfs) in postings.items()
+    ))
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, target)
+    return target
+
+class BM25Index:
+    """Doc postings BM25 tu SQLite theo tung term cua query, tra ve Document qua docstore cua vectorstore."""
+
+    def __init__(self, path: str, vectorstore):
+        self.path = os.path.join(path, BM25_FILE)
+        self.vectorstore = vectorstore
+        self._local = threading.local()
+        stats = json.loads(self._conn().execute("SELECT value FROM meta WHERE key = 'stats'").fetchone()[0])
+        self.n_docs = stats["n_docs"]
+        self.avg_len = stats["avg_len"] or 1.0
+        blob = self._conn().execute("SELECT value FROM meta WHERE key = 'doc_lengths'").fetchone()[0]
+        self.doc_lengths = np.frombuffer(blob, dtype=np.int32)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def search(self, query: str, k: int):
+        # Chi cong diem tren postings cua cac term trong query, khong quet toan bo corpus
+        k1, b = settings.BM25_K1, settings.BM25_B
+        all_positions, all_scores = [], []
+        for term in set(tokenize(query)):
+            row = self._conn().execute("SELECT positions, tfs FROM postings WHERE term = ?", (term,)).fetchone()
+            if row is None:
+                continue
+            positions = np.frombuffer(row[0], dtype=np.int32)
+            tfs = np.frombuffer(row[1], dtype=np.float32)
+            idf = math.log(1 + (self.n_docs - len(positions) + 0.5) / (len(positions) + 0.5))
+            norm = k1 * (1 - b + b * self.doc_lengths[positions] / self.avg_len)
+            all_positions.append(positions)
+            all_scores.append(idf * tfs * (k1 + 1) / (tfs + norm))
+        if not all_positions:
+            return []
+
+        unique, inverse = np.unique(np.concatenate(all_positions), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        top = np.argsort(-scores)[:k]
+        store = self.vectorstore
+        return [
+            (float(scores[i]), store.docstore.search(store.index_to_docstore_id[int(unique[i])]))
+            for i in top
+        ]
+
+class MultiBM25Index:
+    # Moi shard co BM25 rieng; gop theo diem (xap xi vi thong ke IDF tinh theo tung shard)
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    def search(self, query: str, k: int):
+        hits = [hit for index in self.indexes for hit in index.search(query, k)]
+        return sorted(hits, key=lambda hit: -hit[0])[:k]
+
+def doc_key(doc):
+    return doc.id or (doc.metadata.get("source"), doc.page_content)
+
+class HybridRetriever(BaseRetriever):
+    """Gop ket qua dense (FAISS) va lexical (BM25) bang reciprocal rank fusion."""
+
+    dense: Any
+    lexical: Any
+    k: int = 5
+    candidates: int = 20
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None):
+        with span("dense_retrieve"):
+            dense = self.dense.invoke(query)
+        with span("bm25_search"):
+            lexical = [doc for _, doc in self.lexical.search(query, self.candidates)]
+
+        with span("rrf"):
+            scores, docs = defaultdict(float), {}
+            for ranked in (dense, lexical):
+                for rank, doc in enumerate(ranked):
+                    key = doc_key(doc)
+                    scores[key] += 1 / (self.rrf_k + rank + 1)
+                    docs.setdefault(key, doc)
+            best = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [docs[key] for key in best]
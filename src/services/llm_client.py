@@ -0,0 +1,278 @@
+import asyncio
+import json
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, List
+
+import httpx
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.services import metrics
+from src.services.tracing import observe
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+_DONE = object()
+
+class LLMError(Exception):
+    """Loi cuoi cung sau khi het retry, message hien thi duoc cho nguoi dung."""
+
+class RetryableError(Exception):
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """Client chat completions (API kieu OpenAI/Groq) dung chung cho ca process.
+
+    Mot httpx.AsyncClient (pool ket noi keep-alive) chay tren event loop rieng;
+    code dong bo goi qua stream(). Moi lan goi co timeout, retry co jitter khi
+    gap 429/5xx/timeout truoc token dau tien, va neu bat hedging thi gui them
+    mot request du phong khi token dau tien cham hon p95 cac lan gan day.
+    """
+
+    def __init__(self, base_url: str, api_key: str, timeout: float = 30, connect_timeout: float = 5,
+                 max_retries: int = 2, backoff: float = 0.5, max_backoff: float = 8,
+                 hedge: bool = False, hedge_min_delay: float = 1.0, hedge_percentile: float = 95,
+                 max_connections: int = 20):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_percentile = hedge_percentile
+        self._ttfts = deque(maxlen=200)
+        self._stats = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+        metrics.counter("rag_llm_requests_total", "So lan goi LLM", fn=lambda: self._stats["requests"])
+        metrics.counter("rag_llm_retries_total", "So lan thu lai request LLM", fn=lambda: self._stats["retries"])
+        metrics.counter("rag_llm_hedges_total", "So request du phong (hedge) da gui", fn=lambda: self._stats["hedges"])
+        metrics.counter(
+            "rag_llm_hedge_wins_total", "So lan request du phong tra token truoc", fn=lambda: self._stats["hedge_wins"]
+        )
+        metrics.counter("rag_llm_errors_total", "So lan goi LLM loi sau khi het retry", fn=lambda: self._stats["errors"])
+        metrics.gauge("rag_llm_hedge_delay_seconds", "Thoi gian cho truoc khi gui request du phong", fn=self.hedge_delay)
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+        self._client = self._run(self._make_client(
+            base_url, api_key, httpx.Timeout(timeout, connect=connect_timeout),
+            httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        ))
+
+    @staticmethod
+    async def _make_client(base_url, api_key, timeout, limits):
+        return httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/",
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            timeout=timeout,
+            limits=limits,
+        )
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def hedge_delay(self) -> float:
+        # p95 TTFT cua cac request gan day; it mau qua thi dung hedge_min_delay
+        with self._lock:
+            samples = list(self._ttfts)
+        if len(samples) < 20:
+            return self.hedge_min_delay
+        return max(self.hedge_min_delay, float(np.percentile(samples, self.hedge_percentile)))
+
+    async def _open(self, payload: dict):
+        """Gui request va doc toi token dau tien; tra ve (response, lines, token dau)."""
+        start = time.perf_counter()
+        request = self._client.build_request("POST", "chat/completions", json=payload)
+        try:
+            response = await self._client.send(request, stream=True)
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            raise RetryableError(f"{type(e).__name__}: {e}")
+
+        try:
+            if response.status_code in RETRY_STATUS:
+                await response.aread()
+                raise RetryableError(f"HTTP {response.status_code}", _retry_after(response))
+            if response.status_code >= 400:
+                await response.aread()
+                raise LLMError(f"Dịch vụ AI từ chối yêu cầu (HTTP {response.status_code}): {response.text[:200]}")
+
+            lines = response.aiter_lines()
+            async for token in self._tokens(lines):
+                with self._lock:
+                    self._ttfts.append(time.perf_counter() - start)
+                return response, lines, token
+            return response, lines, None
+        except httpx.TimeoutException as e:
+            await response.aclose()
+            raise RetryableError(f"{type(e).__name__}: {e}")
+        except BaseException:
+            await response.aclose()
+            raise
+
+    @staticmethod
+    async def _tokens(lines):
+        # Server-sent events cua chat completions: data: {...} ... data: [DONE]
+        async for line in lines:
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            choices = json.loads(data).get("choices") or [{}]
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+
+    async def _open_hedged(self, payload: dict):
+        primary = asyncio.ensure_future(self._open(payload))
+        if not self.hedge:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+        if done:
+            return primary.result()
+
+        # Request dau tien cham bat thuong: gui them mot request, lay cai nao co token truoc
+        self._count("hedges")
+        backup = asyncio.ensure_future(self._open(payload))
+        pending = {primary, backup}
+        winner, error = None, None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif winner is None:
+                    winner = task
+                else:
+                    # Ca hai cung xong: dong response thua
+                    await task.result()[0].aclose()
+        for task in pending:
+            task.cancel()
+        if winner is None:
+            raise error
+        if winner is backup:
+            self._count("hedge_wins")
+        return winner.result()
+
+    async def _open_with_retry(self, payload: dict):
+        self._count("requests")
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._open_hedged(payload)
+            except RetryableError as e:
+                if attempt == self.max_retries:
+                    self._count("errors")
+                    raise LLMError(f"Dịch vụ AI đang quá tải hoặc không phản hồi, vui lòng thử lại sau ({e}).")
+                self._count("retries")
+                # Full jitter de cac pod khong retry cung luc; ton trong Retry-After neu co
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                await asyncio.sleep(max(delay, e.retry_after or 0))
+            except LLMError:
+                self._count("errors")
+                raise
+
+    async def _astream(self, payload: dict, out: queue.Queue):
+        try:
+            response, lines, token = await self._open_with_retry(payload)
+            try:
+                if token is not None:
+                    out.put(token)
+                    async for token in self._tokens(lines):
+                        out.put(token)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                # Da tra token cho nguoi dung nen khong retry giua chung duoc
+                raise LLMError(f"Mất kết nối tới dịch vụ AI giữa chừng ({type(e).__name__}).")
+            finally:
+                await response.aclose()
+            out.put(_DONE)
+        except BaseException as e:
+            out.put(e)
+
+    def stream(self, payload: dict):
+        """Yield tung doan text cua cau tra loi (goi tu code dong bo, moi thread deu duoc)."""
+        out = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._astream({**payload, "stream": True}, out), self._loop)
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Nguoi goi dung giua chung (client ngat ket noi): huy request dang chay
+            future.cancel()
+
+    def warm_up(self):
+        # Mo san ket noi TLS toi API (GET /models khong ton token); loi thi bo qua
+        async def ping():
+            try:
+                response = await self._client.get("models")
+                return response.status_code
+            except httpx.HTTPError:
+                return None
+        return self._run(ping())
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hedge_delay"] = self.hedge_delay()
+        return stats
+
+class PooledChatModel(BaseChatModel):
+    """Chat model LangChain goi qua LLMClient, thay cho ChatGroq."""
+
+    client: Any
+    model: str
+    temperature: float = 0.1
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-openai-compatible"
+
+    def _payload(self, messages, stop) -> dict:
+        roles = {"system": "system", "human": "user", "ai": "assistant"}
+        payload = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [{"role": roles.get(m.type, "user"), "content": m.content} for m in messages],
+        }
+        if stop:
+            payload["stop"] = stop
+        return payload
+
+    def _stream(self, messages: List, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        first = True
+        for text in self.client.stream(self._payload(messages, stop)):
+            if first:
+                observe("llm_first_token", time.perf_counter() - start)
+                first = False
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+        observe("llm", time.perf_counter() - start)
+
+    def _generate(self, messages: List, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = "".join(chunk.text for chunk in self._stream(messages, stop, run_manager))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
@@ -0,0 +1,192 @@
+"""Metrics dang text Prometheus, khong can prometheus_client.
+
+Streamlit khong them route duoc nen metrics (va cac route van hanh khac nhu
+/ready, xem add_route) duoc phuc vu boi mot HTTP server nho chay trong thread
+rieng (start_metrics_server); src/api.py cung tra /metrics.
+"""
+import math
+import os
+import resource
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = {}
+_registry_lock = threading.Lock()
+_server = None
+_routes = {"/metrics": lambda: (200, CONTENT_TYPE, render())}
+
+def _register(metric):
+    with _registry_lock:
+        # Module co the bi import lai (Streamlit rerun): dung lai metric da co
+        return _registry.setdefault(metric.name, metric)
+
+def _labels_text(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels_text(self.label_names, key)} {_format(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=(), fn=None):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def render(self):
+        # Counter do noi khac dem (vd CPU cua process) thi doc luc scrape
+        if self.fn is not None:
+            with self._lock:
+                self._values[()] = self.fn()
+        return super().render()
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels=(), fn=None):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        # Gauge tinh luc scrape (vd do sau hang doi) thi goi fn
+        if self.fn is not None:
+            self.set(self.fn())
+        return super().render()
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            for bound, count in zip(self.buckets, counts):
+                le = _labels_text(self.label_names, key, f'le="{_format(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            labels = _labels_text(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format(total)}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+def counter(name: str, help: str, labels=(), fn=None) -> Counter:
+    metric = _register(Counter(name, help, labels, fn))
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+def gauge(name: str, help: str, labels=(), fn=None) -> Gauge:
+    metric = _register(Gauge(name, help, labels, fn))
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+def histogram(name: str, help: str, labels=(), buckets=Histogram.DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labels, buckets))
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _resident_bytes() -> float:
+    # /proc co tren Linux (pod); noi khac dung RSS cao nhat
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+# Cung ten voi prometheus_client de dashboard/HPA va benchmarks/loadtest.py dung chung
+counter("process_cpu_seconds_total", "Tong CPU user + system cua process (giay)", fn=_cpu_seconds)
+gauge("process_resident_memory_bytes", "RSS cua process (byte)", fn=_resident_bytes)
+
+def add_route(path: str, handler):
+    """handler() tra ve (status, content type, body) cho GET path tren metrics server."""
+    _routes[path] = handler
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        handler = _routes.get(self.path.split("?")[0])
+        if handler is None:
+            self.send_error(404)
+            return
+        status, content_type, text = handler()
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int):
+    """Chay /metrics tren port rieng (mot lan moi process); port 0 = tat."""
+    global _server
+    if port <= 0 or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    except OSError as e:
+        # Port da dung (vd nhieu process tren cung may): van chay app, chi khong co metrics
+        print(f"Khong mo duoc metrics server port {port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
@@ -0,0 +1,81 @@
+import os
+from typing import Any
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+from src.services.tracing import span
+
+VECTORS_FILE = "vectors.npy"
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def write_vectors(vectorstore, path: str):
+    # Vector da chuan hoa, lien tuc trong mot file .npy theo dung vi tri FAISS
+    target = os.path.join(path, VECTORS_FILE)
+    index = vectorstore.index
+    vectors = normalize(index.reconstruct_n(0, index.ntotal)).astype(np.float32)
+    with open(target + ".tmp", "wb") as f:
+        np.save(f, vectors)
+    os.replace(target + ".tmp", target)
+    return target
+
+def load_vectors(path: str):
+    # mmap nen khong ton RAM rieng cho moi pod; None neu version nay chua co vectors.npy
+    target = os.path.join(path, VECTORS_FILE)
+    if not os.path.exists(target):
+        return None
+    return np.load(target, mmap_mode="r")
+
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5):
+    """Chon k ung vien theo MMR, query va candidates da chuan hoa.
+
+    Do tuong dong query-ung vien va ung vien-ung vien tinh mot lan bang nhan ma
+    tran; moi buoc chon chi cap nhat mang max_sim, khong co vong lap Python tren
+    tung ung vien nen fetch_k vai tram van nhanh.
+    """
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    selected = [int(np.argmax(relevance))]
+    max_sim = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, similarity[best], out=max_sim)
+    return selected
+
+class VectorMMRRetriever(BaseRetriever):
+    """MMR tren mang vector chuan hoa, thay cho reconstruct tung vector nhu FAISS.max_marginal_relevance_search."""
+
+    vectorstore: Any
+    vectors: Any
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def search_by_vector(self, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with span("faiss_search"):
+            _, positions = self.vectorstore.index.search(embedding[None, :], self.fetch_k)
+        positions = positions[0][positions[0] != -1]
+        with span("mmr"):
+            picks = mmr_select(normalize(embedding), self.vectors[positions], self.k, self.lambda_mult)
+
+        store = self.vectorstore
+        with span("docstore"):
+            return [store.docstore.search(store.index_to_docstore_id[int(positions[i])]) for i in picks]
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None):
+        return self.search_by_vector(self.vectorstore.embeddings.embed_query(query))
@@ -0,0 +1,87 @@
+"""Profile mot so request de tim cho cham ma khong bat profiler cho ca pod.
+
+PROFILE_MODE=cprofile chay request duoi cProfile va ghi file .prof (xem bang
+`python -m pstats` hoac snakeviz); chi do thread goi, phan chay trong thread pool
+cua LangChain/LLM client chi hien la thoi gian cho. PROFILE_MODE=sample lay stack
+moi thread sau moi PROFILE_INTERVAL_MS va ghi file .folded giong `py-spy record
+-f raw` (mo bang speedscope hoac flamegraph.pl). PROFILE_RATE la ti le request
+duoc profile.
+"""
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from src.config import settings
+
+def _output_path(name: str, ext: str) -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(settings.PROFILE_DIR, f"{stamp}-{name}-{uuid.uuid4().hex[:6]}.{ext}")
+
+def _folded(thread_name: str, frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    # Ten thread lam goc de loc theo thread tren flamegraph
+    return ";".join([thread_name, *reversed(names)])
+
+@contextmanager
+def _cprofile(path: str):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+@contextmanager
+def _sample(path: str, interval: float):
+    stacks = Counter()
+    stop = threading.Event()
+
+    def run():
+        me = threading.get_ident()
+        while not stop.wait(interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    stacks[_folded(names.get(ident, str(ident)), frame)] += 1
+
+    sampler = threading.Thread(target=run, name="profile-sampler", daemon=True)
+    sampler.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        sampler.join()
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+@contextmanager
+def profile_request(name: str = "request", force: bool = False):
+    """Profile khoi lenh ben trong theo PROFILE_MODE; yield duong dan file hoac None."""
+    mode = settings.PROFILE_MODE
+    if mode == "off" or not (force or random.random() < settings.PROFILE_RATE):
+        yield None
+        return
+    if mode == "cprofile":
+        path = _output_path(name, "prof")
+        profiler = _cprofile(path)
+    elif mode == "sample":
+        path = _output_path(name, "folded")
+        profiler = _sample(path, settings.PROFILE_INTERVAL_MS / 1000)
+    else:
+        raise ValueError(f"PROFILE_MODE khong hop le: {mode}")
+    with profiler:
+        yield path
+    print(f"Da ghi profile: {path}")
@@ -0,0 +1,126 @@
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from src.services import metrics
+from src.services.tracing import span
+
+def normalize_text(text: str) -> str:
+    # Chi gop khoang trang, khong doi chu hoa/thuong vi model phan biet hoa thuong
+    return re.sub(r"\s+", " ", text).strip()
+
+class BatchingEmbeddings(Embeddings):
+    """Embed query dung chung cho moi session trong process.
+
+    Query dong thoi duoc gom thanh mot batch trong cua so window_ms (toi da
+    max_batch query) roi embed mot lan; query lap lai lay tu cache LRU co TTL.
+    embed_documents (process_docs) di thang xuong model ben duoi.
+    """
+
+    def __init__(self, embeddings, max_batch: int = 32, window_ms: float = 5,
+                 cache_size: int = 1024, cache_ttl: float = 3600):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stats = {"hits": 0, "misses": 0, "batches": 0, "batched_queries": 0, "max_batch_size": 0}
+
+        metrics.counter("rag_query_embed_cache_hits_total", "So query lay vector tu cache", fn=lambda: self._stats["hits"])
+        metrics.counter("rag_query_embed_cache_misses_total", "So query phai embed", fn=lambda: self._stats["misses"])
+        metrics.counter("rag_query_embed_batches_total", "So batch embed query", fn=lambda: self._stats["batches"])
+        metrics.counter(
+            "rag_query_embed_batched_queries_total", "Tong so query trong cac batch embed",
+            fn=lambda: self._stats["batched_queries"],
+        )
+        metrics.gauge("rag_query_embed_cache_entries", "So vector dang nam trong cache", fn=lambda: len(self._cache))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("embed_query"):
+            return self._embed_query(text)
+
+    def _embed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return list(entry[0])
+            self._stats["misses"] += 1
+            # Cung query dang cho embed thi dung chung ket qua
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queue.put(key)
+                self._start()
+        return list(future.result())
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="query-embedder", daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                # Model nay embed query va document giong nhau nen embed_documents cho ca batch
+                vectors = self.embeddings.embed_documents(batch)
+            except Exception as e:
+                with self._lock:
+                    futures = [self._pending.pop(key) for key in batch]
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            expires = time.monotonic() + self.cache_ttl
+            with self._lock:
+                futures = [self._pending.pop(key) for key in batch]
+                for key, vector in zip(batch, vectors):
+                    self._cache[key] = (tuple(vector), expires)
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self._stats["batches"] += 1
+                self._stats["batched_queries"] += len(batch)
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            for future, vector in zip(futures, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cache_size"] = len(self._cache)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["avg_batch_size"] = stats["batched_queries"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
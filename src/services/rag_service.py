@@ -1,13 +1,30 @@
 import os
+import sqlite3
+import threading
+from operator import itemgetter
 import streamlit as st
-from langchain_groq import ChatGroq
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
 
 from src.config import settings
+from src.services.admission import AdmissionController
+from src.services.answer_cache import AnswerCache
+from src.services.context import pack_context
+from src.services.docstore import DOCSTORE_FILE, load_compact_vectorstore
+from src.services.embeddings import get_embeddings
+from src.services.history import build_history, count_tokens, retrieval_query
+from src.services.llm_client import LLMClient, PooledChatModel
+from src.services.lexical import BM25_FILE, BM25Index, HybridRetriever, MultiBM25Index
+from src.services.metrics import add_route, start_metrics_server
+from src.services.mmr import VectorMMRRetriever, load_vectors
+from src.services.query_embeddings import BatchingEmbeddings
+from src.services.shards import ShardedVectorstore, list_shards, shard_path
+from src.services.tracing import record_tokens, span
+from src.services.vector_index import load_serving_index
+from src.services.versions import active_path, current_version, version_path
+from src.services.warmup import Warmup
 
 SYSTEM_PROMPT = """Bạn là trợ lý AI chính thức của cộng đồng First Cloud AI Journey (FCAJ) – AWS Vietnam.
 
@@ -89,48 +106,280 @@ Giúp người dùng:
 - Áp dụng được cho học tập, project và phỏng vấn
 """
 
+def open_vectorstore(path: str, embeddings):
+    shards = list_shards(path)
+    if shards is not None:
+        return ShardedVectorstore(
+            {shard: open_vectorstore(shard_path(path, shard), embeddings) for shard in shards},
+            embeddings,
+            vectors={shard: load_vectors(shard_path(path, shard)) for shard in shards},
+        )
+
+    # Vectorstore tao truoc khi co docstore SQLite thi van load bang pickle
+    if settings.VECTORSTORE_FORMAT == "mmap" and os.path.exists(f"{path}/{DOCSTORE_FILE}"):
+        return load_compact_vectorstore(path, embeddings)
+
+    vectorstore = FAISS.load_local(
+        path, embeddings, allow_dangerous_deserialization=True
+    )
+    return load_serving_index(vectorstore, path)
+
+def open_lexical_index(path: str, vectorstore):
+    # None neu version nay chua co bm25.sqlite (tao truoc khi co hybrid)
+    if isinstance(vectorstore, ShardedVectorstore):
+        indexes = [open_lexical_index(shard_path(path, shard), store) for shard, store in vectorstore.shards.items()]
+        return MultiBM25Index(indexes) if all(indexes) else None
+    if not os.path.exists(os.path.join(path, BM25_FILE)):
+        return None
+    return BM25Index(path, vectorstore)
+
+def dense_retriever(path: str, vectorstore, k: int, fetch_k: int):
+    # MMR vector hoa tren vectors.npy; version cu chua co file nay thi dung MMR cua LangChain
+    vectors = None if isinstance(vectorstore, ShardedVectorstore) else load_vectors(path)
+    if settings.SEARCH_TYPE == "mmr" and vectors is not None:
+        return VectorMMRRetriever(vectorstore=vectorstore, vectors=vectors, k=k, fetch_k=fetch_k)
+    return vectorstore.as_retriever(
+        search_type=settings.SEARCH_TYPE,
+        search_kwargs={"k": k, "fetch_k": fetch_k}
+    )
+
+def make_retriever(path: str, vectorstore):
+    lexical = open_lexical_index(path, vectorstore) if settings.RETRIEVAL_MODE == "hybrid" else None
+    if lexical is None:
+        return dense_retriever(path, vectorstore, settings.SEARCH_K, settings.FETCH_K)
+
+    # Dense lay nhieu ung vien hon SEARCH_K, RRF chon lai SEARCH_K chunk tot nhat
+    dense = dense_retriever(
+        path, vectorstore, settings.HYBRID_CANDIDATES, max(settings.FETCH_K, 2 * settings.HYBRID_CANDIDATES)
+    )
+    return HybridRetriever(
+        dense=dense,
+        lexical=lexical,
+        k=settings.SEARCH_K,
+        candidates=settings.HYBRID_CANDIDATES,
+        rrf_k=settings.RRF_K,
+    )
+
+class VectorstoreManager:
+    """Giu vectorstore dang phuc vu va doi sang version moi ma khong can restart pod.
+
+    Version, vectorstore va retriever duoc thay cung luc bang mot phep gan, nen
+    query dang chay dung xong version cu con query moi dung version moi. Version
+    cu duoc giai phong khi khong con query nao giu tham chieu.
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self._state = self._open(current_version(), active_path())
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open(self, version, path):
+        vectorstore = open_vectorstore(path, self.embeddings)
+        return version, vectorstore, make_retriever(path, vectorstore)
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    @property
+    def vectorstore(self):
+        return self._state[1]
+
+    def retrieve(self, query: str):
+        with span("retrieve"):
+            return self._state[2].invoke(query)
+
+    def reload(self) -> bool:
+        version = current_version()
+        if version is None or version == self.version:
+            return False
+        self._state = self._open(version, version_path(version))
+        return True
+
+    def start_watching(self, interval: int):
+        if interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, args=(interval,), name="vectorstore-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self, interval: int):
+        while not self._stop.wait(interval):
+            try:
+                if self.reload():
+                    print(f"Da chuyen sang vectorstore version {self.version}")
+            except Exception as e:
+                # Thu lai o lan kiem tra sau, van phuc vu bang version hien tai
+                print(f"Khong load duoc vectorstore version moi: {e}")
+
 @st.cache_resource
-def load_vectorstore():
-    embeddings = HuggingFaceEmbeddings(
-        model_name=settings.EMBEDDING_MODEL,
-        cache_folder=settings.CACHE_FOLDER,
+def get_query_embeddings():
+    # Mot model + mot cache cho tat ca session trong process
+    return BatchingEmbeddings(
+        get_embeddings(),
+        max_batch=settings.QUERY_MAX_BATCH,
+        window_ms=settings.QUERY_BATCH_WINDOW_MS,
+        cache_size=settings.QUERY_CACHE_SIZE,
+        cache_ttl=settings.QUERY_CACHE_TTL,
     )
 
-    if not os.path.exists(f"{settings.VECTORSTORE_PATH}/index.faiss"):
+def vectorstore_exists() -> bool:
+    return os.path.exists(f"{active_path()}/index.faiss") or bool(list_shards(active_path()))
+
+@st.cache_resource
+def get_vectorstore_manager():
+    if not vectorstore_exists():
         st.error("⚠️ Vectorstore chưa được tạo. Vui lòng chạy `python src/process_docs.py`")
         st.stop()
 
-    return FAISS.load_local(
-        settings.VECTORSTORE_PATH, embeddings, allow_dangerous_deserialization=True
+    manager = VectorstoreManager(get_query_embeddings())
+    manager.start_watching(settings.INDEX_RELOAD_INTERVAL)
+    return manager
+
+@st.cache_resource
+def get_answer_cache():
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    return AnswerCache(
+        settings.ANSWER_CACHE_PATH,
+        get_query_embeddings(),
+        max_entries=settings.ANSWER_CACHE_SIZE,
+        ttl=settings.ANSWER_CACHE_TTL,
+        threshold=settings.ANSWER_CACHE_THRESHOLD,
     )
 
+def chain_input(question: str, messages=()) -> dict:
+    # Chi embed/search query ngan tu luot moi nhat; lich su vao prompt trong ngan sach token
+    with span("history"):
+        history = build_history(list(messages), settings.HISTORY_TOKEN_BUDGET, settings.HISTORY_SUMMARY_TOKENS)
+    if history:
+        record_tokens("history", count_tokens(history))
+    return {
+        "question": question,
+        "query": retrieval_query(messages, question, settings.FOLLOWUP_MAX_TOKENS, settings.RETRIEVAL_QUERY_TOKENS),
+        "history": f"Lịch sử cuộc trò chuyện:\n{history}\n\n" if history else "",
+    }
+
+def stream_answer(question: str, messages=(), on_queue=None):
+    """Stream cau tra loi; messages la cac luot truoc cau hoi nay ({"role", "content"}).
+
+    on_queue(vi tri) duoc goi khi phai xep hang cho LLM; het cho thi raise Rejected.
+    """
+    rag_chain = setup_rag_chain()
+    inputs = chain_input(question, messages)
+    # Chi dung cache cho cau hoi khong kem lich su, vi cau tra loi phu thuoc vao lich su
+    cache = get_answer_cache() if not messages else None
+    if cache is not None:
+        version = get_vectorstore_manager().version
+        answer = None
+        try:
+            with span("answer_cache"):
+                answer = cache.get(question, version)
+        except sqlite3.Error as e:
+            # Cache loi thi van tra loi binh thuong
+            print(f"Khong doc duoc answer cache: {e}")
+        if answer is not None:
+            yield answer
+            return
+
+    chunks = []
+    # Cau tra loi tu cache khong can slot, chi phan retrieve + goi LLM bi gioi han
+    with get_admission_controller().slot(on_queue):
+        for chunk in rag_chain.stream(inputs):
+            chunks.append(chunk)
+            yield chunk
+    answer = "".join(chunks)
+    record_tokens("completion", count_tokens(answer))
+    if cache is not None and answer:
+        try:
+            cache.put(question, answer, version)
+        except sqlite3.Error as e:
+            print(f"Khong ghi duoc answer cache: {e}")
+
+def answer_question(question: str, messages=()) -> str:
+    return "".join(stream_answer(question, messages))
+
+def load_vectorstore():
+    return get_vectorstore_manager().vectorstore
+
+@st.cache_resource
+def get_llm_client():
+    # Mot pool ket noi toi Groq cho ca process
+    return LLMClient(
+        settings.LLM_BASE_URL,
+        settings.GROQ_API_KEY,
+        timeout=settings.LLM_TIMEOUT,
+        connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+        max_retries=settings.LLM_MAX_RETRIES,
+        hedge=settings.LLM_HEDGE,
+        hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+
+@st.cache_resource
+def get_admission_controller():
+    # Metrics (do sau hang doi, thoi gian cho) cho HPA scrape o METRICS_PORT
+    start_metrics_server(settings.METRICS_PORT)
+    return AdmissionController(settings.MAX_IN_FLIGHT, settings.MAX_QUEUE, settings.QUEUE_TIMEOUT)
+
 @st.cache_resource(show_spinner=False)
 def setup_rag_chain():
-    llm = ChatGroq(
+    llm = PooledChatModel(
+        client=get_llm_client(),
         model=settings.LLM_MODEL,
         temperature=settings.LLM_TEMPERATURE,
-        groq_api_key=settings.GROQ_API_KEY,
     )
 
-    vectorstore = load_vectorstore()
-    retriever = vectorstore.as_retriever(
-        search_type=settings.SEARCH_TYPE,
-        search_kwargs={"k": settings.SEARCH_K, "fetch_k": settings.FETCH_K}
-    )
+    # Retriever luon lay tu version dang phuc vu, nen chain khong can build lai khi reload
+    retriever = RunnableLambda(get_vectorstore_manager().retrieve)
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", SYSTEM_PROMPT),
-        ("human", "Thông tin:\n{context}\n\nCâu hỏi:\n{question}"),
+        ("human", "{history}Thông tin:\n{context}\n\nCâu hỏi:\n{question}"),
     ])
 
     def format_docs(docs):
-        return "\n\n".join(doc.page_content for doc in docs) if docs else ""
+        if not docs:
+            return ""
+        with span("context_pack"):
+            context, raw_tokens, packed_tokens = pack_context(docs, settings.CONTEXT_TOKEN_BUDGET)
+        # So token tiet kiem = rag_tokens{kind="context_raw"} - rag_tokens{kind="context"}
+        record_tokens("context_raw", raw_tokens)
+        record_tokens("context", packed_tokens)
+        return context
 
     rag_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
+        {
+            "context": itemgetter("query") | retriever | format_docs,
+            "history": itemgetter("history"),
+            "question": itemgetter("question"),
+        }
         | prompt
         | llm
         | StrOutputParser()
     )
 
     return rag_chain
+
+def _require_vectorstore():
+    # Chay trong thread warm-up nen khong goi st.error/st.stop duoc
+    if not vectorstore_exists():
+        raise RuntimeError("Vectorstore chưa được tạo. Vui lòng chạy `python src/process_docs.py`")
+    get_vectorstore_manager()
+
+@st.cache_resource(show_spinner=False)
+def get_warmup():
+    """Load model, index, LLM client va chay query thu o background ngay khi process khoi dong."""
+    warmup = Warmup([
+        ("Tải model embedding", lambda: get_query_embeddings().embed_query("warm up")),
+        ("Tải vectorstore", _require_vectorstore),
+        ("Kết nối LLM", lambda: (setup_rag_chain(), get_llm_client().warm_up())),
+        ("Chạy thử truy vấn", lambda: get_vectorstore_manager().retrieve("FCAJ là gì?")),
+    ])
+    # /ready tren METRICS_PORT cho readiness probe, tach khoi /_stcore/health cua Streamlit
+    add_route("/ready", warmup.readiness)
+    start_metrics_server(settings.METRICS_PORT)
+    return warmup.start()
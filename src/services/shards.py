@@ -0,0 +1,109 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+from src.config import settings
+from src.services.mmr import mmr_select, normalize
+from src.services.tracing import span
+
+# Vectorstore chia shard: <version>/shards/<ten shard>/ moi shard la mot vectorstore day du
+SHARDS_DIR = "shards"
+
+_executor = None
+
+def shard_for(rel: str) -> str:
+    # "" = khong chia shard, vectorstore nam thang trong thu muc version
+    if settings.SHARD_BY == "folder":
+        return rel.split("/", 1)[0] if "/" in rel else "_root"
+    if settings.SHARD_BY == "hash":
+        digest = hashlib.sha1(rel.encode("utf-8")).hexdigest()
+        return f"{int(digest, 16) % settings.NUM_SHARDS:03d}"
+    return ""
+
+def shard_path(base: str, shard: str) -> str:
+    return os.path.join(base, SHARDS_DIR, shard) if shard else base
+
+def list_shards(path: str):
+    root = os.path.join(path, SHARDS_DIR)
+    if not os.path.isdir(root):
+        return None
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+def search_executor():
+    # FAISS nha GIL khi search nen cac shard chay song song that su tren nhieu core
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.SEARCH_THREADS, thread_name_prefix="shard-search")
+    return _executor
+
+class ShardedVectorstore:
+    """Tap cac vectorstore FAISS doc lap, search song song roi gop top-k."""
+
+    def __init__(self, shards: dict, embeddings, vectors: dict = None):
+        self.shards = shards
+        self.embeddings = embeddings
+        # vectors.npy da chuan hoa (mmap) cua tung shard, dung cho MMR
+        self.vectors = vectors or {}
+
+    @property
+    def ntotal(self) -> int:
+        return sum(store.index.ntotal for store in self.shards.values())
+
+    def _search_shard(self, name: str, query: np.ndarray, k: int):
+        distances, positions = self.shards[name].index.search(query, k)
+        return [(float(d), name, int(p)) for d, p in zip(distances[0], positions[0]) if p != -1]
+
+    def search(self, embedding, k: int):
+        # Tra ve [(distance, shard, vi tri trong shard)] cua k vector gan nhat tren moi shard
+        query = np.array([embedding], dtype=np.float32)
+        futures = [search_executor().submit(self._search_shard, name, query, k) for name in self.shards]
+        hits = [hit for future in futures for hit in future.result()]
+        return sorted(hits)[:k]
+
+    def candidate_vectors(self, hits):
+        # Gather vector da chuan hoa cua ung vien theo tung shard
+        dim = next(iter(self.shards.values())).index.d
+        out = np.empty((len(hits), dim), dtype=np.float32)
+        for shard in {shard for _, shard, _ in hits}:
+            rows = [i for i, hit in enumerate(hits) if hit[1] == shard]
+            positions = [hits[i][2] for i in rows]
+            if self.vectors.get(shard) is not None:
+                out[rows] = self.vectors[shard][positions]
+            else:
+                index = self.shards[shard].index
+                out[rows] = normalize(np.array([index.reconstruct(pos) for pos in positions]))
+        return out
+
+    def document(self, shard: str, pos: int):
+        store = self.shards[shard]
+        return store.docstore.search(store.index_to_docstore_id[pos])
+
+    def as_retriever(self, search_type: str = "similarity", search_kwargs: dict = None):
+        return ShardedRetriever(store=self, search_type=search_type, **(search_kwargs or {}))
+
+class ShardedRetriever(BaseRetriever):
+    store: Any
+    search_type: str = "similarity"
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None):
+        embedding = self.store.embeddings.embed_query(query)
+        if self.search_type != "mmr":
+            with span("faiss_search"):
+                hits = self.store.search(embedding, self.k)
+        else:
+            # MMR tren tap ung vien da gop tu moi shard, giong FAISS.max_marginal_relevance_search
+            with span("faiss_search"):
+                candidates = self.store.search(embedding, self.fetch_k)
+            with span("mmr"):
+                query = normalize(np.asarray(embedding, dtype=np.float32))
+                picks = mmr_select(query, self.store.candidate_vectors(candidates), self.k, self.lambda_mult)
+            hits = [candidates[i] for i in picks]
+        with span("docstore"):
+            return [self.store.document(shard, pos) for _, shard, pos in hits]
@@ -0,0 +1,62 @@
+"""Do thoi gian tung buoc cua mot cau tra loi (embed, search, MMR, LLM...).
+
+Moi span duoc gop vao histogram rag_stage_seconds{stage=...} tren /metrics; neu
+dang trong trace() (vd mot lan tra loi tren Streamlit) thi con duoc ghi vao danh
+sach span cua request do de in ra log.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.services import metrics
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_stage_seconds = metrics.histogram(
+    "rag_stage_seconds", "Thoi gian tung buoc khi tra loi", labels=("stage",), buckets=STAGE_BUCKETS
+)
+_tokens = metrics.histogram(
+    "rag_tokens", "So token (uoc luong) moi cau tra loi", labels=("kind",), buckets=TOKEN_BUCKETS
+)
+_current = ContextVar("rag_trace", default=None)
+
+def observe(stage: str, seconds: float):
+    _stage_seconds.observe(seconds, stage=stage)
+    spans = _current.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+def record_tokens(kind: str, count: int):
+    _tokens.observe(count, kind=kind)
+    spans = _current.get()
+    if spans is not None:
+        spans.append((f"{kind}_tokens", count))
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+@contextmanager
+def trace():
+    """Gom cac span trong context hien tai (ke ca thread con cua LangChain) vao mot list."""
+    spans = []
+    token = _current.set(spans)
+    try:
+        yield spans
+    finally:
+        _current.reset(token)
+
+def format_spans(spans) -> str:
+    # Cung stage (vd embed_query hai lan) thi cong lai
+    totals = {}
+    for stage, value in spans:
+        totals[stage] = totals.get(stage, 0) + value
+    return " ".join(
+        f"{stage}={value}" if stage.endswith("_tokens") else f"{stage}={value * 1000:.0f}ms"
+        for stage, value in totals.items()
+    )
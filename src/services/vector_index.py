@@ -0,0 +1,103 @@
+import math
+import os
+
+import faiss
+import numpy as np
+
+from src.config import settings
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+STORAGE_TYPES = ("float32", "float16", "sq8")
+
+_STORAGE_CODES = {"float32": "Flat", "float16": "SQfp16", "sq8": "SQ8"}
+
+def ivf_nlist(ntotal: int) -> int:
+    if settings.IVF_NLIST:
+        return settings.IVF_NLIST
+    # ~4*sqrt(N) list, nhung moi list can it nhat ~39 vector de train k-means
+    return max(1, min(int(4 * math.sqrt(ntotal)), ntotal // 39))
+
+def factory_string(index_type: str, storage: str, ntotal: int, dim: int) -> str:
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"INDEX_TYPE khong hop le: {index_type} (chon {', '.join(INDEX_TYPES)})")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"INDEX_STORAGE khong hop le: {storage} (chon {', '.join(STORAGE_TYPES)})")
+
+    code = _STORAGE_CODES[storage]
+    if index_type == "flat":
+        return code
+    if index_type == "hnsw":
+        return f"HNSW{settings.HNSW_M}" + ("" if storage == "float32" else f"_{code}")
+    if index_type == "ivf_flat":
+        return f"IVF{ivf_nlist(ntotal)},{code}"
+    if dim % settings.PQ_M:
+        raise ValueError(f"PQ_M={settings.PQ_M} phai chia het so chieu vector ({dim})")
+    return f"IVF{ivf_nlist(ntotal)},PQ{settings.PQ_M}x{settings.PQ_NBITS}"
+
+def min_train_size(index_type: str) -> int:
+    if index_type == "ivf_pq":
+        return 1 << settings.PQ_NBITS
+    if index_type == "ivf_flat":
+        return 39
+    return 0
+
+def serving_index_name(index_type: str = None, storage: str = None) -> str:
+    index_type = index_type or settings.INDEX_TYPE
+    storage = storage or settings.INDEX_STORAGE
+    return f"index.{index_type}-{storage}.faiss"
+
+def serving_fallback_name() -> str:
+    # Danh dau shard qua nho, khong tao duoc index serving nen dung index flat
+    return serving_index_name() + ".fallback"
+
+def build_index(vectors: np.ndarray, index_type: str, storage: str):
+    ntotal, dim = vectors.shape
+    if ntotal < min_train_size(index_type):
+        raise ValueError(f"Can it nhat {min_train_size(index_type)} vector de train {index_type}, hien co {ntotal}")
+
+    index = faiss.index_factory(dim, factory_string(index_type, storage, ntotal, dim), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+def apply_search_params(index):
+    # nprobe/efSearch khong luu trong file index nen dat lai moi lan load
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = max(settings.HNSW_EF_SEARCH, settings.FETCH_K)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = settings.IVF_NPROBE
+        # MMR cua LangChain can reconstruct vector theo vi tri
+        ivf.make_direct_map()
+    return index
+
+def save_serving_index(flat_index, path: str):
+    """Tao index theo INDEX_TYPE/INDEX_STORAGE tu index flat dung khi build.
+
+    Index flat van la ban goc de process_docs.py them/xoa vector; index serving
+    chi duoc tao lai tu no, giu nguyen thu tu vector nen van khop docstore.
+    """
+    target = os.path.join(path, serving_index_name())
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+    index = build_index(vectors, settings.INDEX_TYPE, settings.INDEX_STORAGE)
+    faiss.write_index(index, target + ".tmp")
+    os.replace(target + ".tmp", target)
+    return target
+
+def load_serving_index(vectorstore, path: str):
+    if settings.INDEX_TYPE == "flat" and settings.INDEX_STORAGE == "float32":
+        return vectorstore
+
+    target = os.path.join(path, serving_index_name())
+    if not os.path.exists(target):
+        print(f"Khong tim thay {target}, dung index flat")
+        return vectorstore
+
+    index = faiss.read_index(target)
+    if index.ntotal != vectorstore.index.ntotal:
+        print(f"{target} khong khop voi index.faiss, dung index flat")
+        return vectorstore
+
+    vectorstore.index = apply_search_params(index)
+    return vectorstore
@@ -0,0 +1,61 @@
+import os
+import shutil
+from datetime import datetime
+
+from src.config import settings
+
+# Moi lan build ghi vao VECTORSTORE_PATH/versions/<version>/, sau khi xong moi
+# doi file CURRENT sang version moi (os.replace la atomic) de app load lai.
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+
+def versions_root() -> str:
+    return os.path.join(settings.VECTORSTORE_PATH, VERSIONS_DIR)
+
+def version_path(version: str) -> str:
+    return os.path.join(versions_root(), version)
+
+def current_version():
+    try:
+        with open(os.path.join(settings.VECTORSTORE_PATH, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def active_path() -> str:
+    # Vectorstore tao truoc khi co version thi nam thang trong VECTORSTORE_PATH
+    version = current_version()
+    return version_path(version) if version else settings.VECTORSTORE_PATH
+
+def list_versions():
+    if not os.path.isdir(versions_root()):
+        return []
+    return sorted(name for name in os.listdir(versions_root()) if os.path.isdir(version_path(name)))
+
+def new_version() -> str:
+    # Ten theo thoi gian nen sap xep ten = sap xep theo thu tu build
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+def unpublished_version():
+    # Lan build moi hon CURRENT nhung chua publish (bi crash giua chung)
+    current = current_version()
+    newer = [v for v in list_versions() if current is None or v > current]
+    return newer[-1] if newer else None
+
+def publish(version: str):
+    path = os.path.join(settings.VECTORSTORE_PATH, CURRENT_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(path + ".tmp", path)
+
+def gc_versions(keep: int = None):
+    # Giu lai version hien tai va keep - 1 version lien truoc de pod chua kip reload van doc duoc
+    keep = settings.KEEP_VERSIONS if keep is None else keep
+    current = current_version()
+    if current is None:
+        return []
+    older = [v for v in list_versions() if v < current]
+    removed = older[:max(0, len(older) - (keep - 1))]
+    for version in removed:
+        shutil.rmtree(version_path(version), ignore_errors=True)
+    return removed
@@ -0,0 +1,61 @@
+import json
+import threading
+import time
+
+class Warmup:
+    """Chay cac buoc khoi dong (load model, index, ket noi LLM, query thu) trong thread nen.
+
+    steps la danh sach (ten hien thi, ham). Buoc loi thi thu lai toan bo sau
+    retry_interval giay; cac buoc da xong duoc cache nen chay lai rat nhanh.
+    """
+
+    def __init__(self, steps, retry_interval: float = 10):
+        self.steps = steps
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._state = {"ready": False, "step": None, "completed": 0, "total": len(steps), "error": None, "seconds": 0.0}
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _update(self, **changes):
+        with self._lock:
+            self._state.update(changes)
+
+    def _run(self):
+        start = time.monotonic()
+        while True:
+            try:
+                for i, (name, fn) in enumerate(self.steps):
+                    self._update(step=name, completed=i)
+                    fn()
+                self._update(ready=True, step=None, completed=len(self.steps), error=None,
+                             seconds=time.monotonic() - start)
+                print(f"Warm-up xong sau {time.monotonic() - start:.1f}s")
+                return
+            except Exception as e:
+                self._update(error=f"{self._state['step']}: {e}")
+                print(f"Warm-up loi ({self._state['step']}): {e}, thu lai sau {self.retry_interval}s")
+                time.sleep(self.retry_interval)
+
+    @property
+    def ready(self) -> bool:
+        return self._state["ready"]
+
+    def state(self) -> dict:
+        with self._lock:
+            return dict(self._state)
+
+    def wait(self, timeout: float = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def readiness(self):
+        # (status, content type, body) cho route /ready
+        state = self.state()
+        return (200 if state["ready"] else 503), "application/json", json.dumps(state, ensure_ascii=False)
@@ -0,0 +1,69 @@
+import json
+import re
+import unicodedata
+
+def _is_word_char(c: str) -> bool:
+    # Giong \w cua re: chu cai/so Unicode (ca tieng Viet co dau) va dau gach duoi
+    return c.isalnum() or c == "_"
+
+def fold(text: str) -> str:
+    # NFC de chu co dau go bang bo go to hop (NFD) van khop voi alias
+    return unicodedata.normalize("NFC", text).lower()
+
+class AliasMatcher:
+    """Thay alias bang ten chuan trong mot lan duyet cau hoi.
+
+    Cac alias duoc dung thanh mot trie theo ky tu; tai moi dau tu co the la dau
+    mot alias (tim bang regex), di xuong trie va lay alias dai nhat ket thuc o
+    cuoi mot tu. Chi phi theo do dai cau hoi, khong theo so alias, nen bang alias
+    co the len toi hang nghin muc.
+    """
+
+    _END = ""
+
+    def __init__(self, aliases: dict):
+        self.root = {}
+        for alias, canonical in aliases.items():
+            node = self.root
+            for c in fold(alias):
+                node = node.setdefault(c, {})
+            node[self._END] = canonical
+        first = "".join(c for c in self.root if c != self._END)
+        self._starts = re.compile(rf"(?<!\w)[{re.escape(first)}]") if first else None
+
+    @classmethod
+    def from_file(cls, path: str) -> "AliasMatcher":
+        # File JSON gom cac nhom {alias: ten chuan}; nhom chi de de doc, khi khop thi gop chung
+        with open(path, encoding="utf-8") as f:
+            groups = json.load(f)
+        return cls({alias: canonical for group in groups.values() for alias, canonical in group.items()})
+
+    def _longest_match(self, text: str, start: int):
+        node, match = self.root, None
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if self._END in node and (i + 1 == len(text) or not _is_word_char(text[i + 1])):
+                match = (i + 1, node[self._END])
+        return match
+
+    def replace(self, text: str) -> str:
+        if self._starts is None:
+            return text
+        out, last, pos = [], 0, 0
+        while True:
+            candidate = self._starts.search(text, pos)
+            if candidate is None:
+                break
+            start = candidate.start()
+            match = self._longest_match(text, start)
+            if match is None:
+                pos = start + 1
+                continue
+            end, canonical = match
+            out.append(text[last:start])
+            out.append(canonical)
+            last = pos = end
+        out.append(text[last:])
+        return "".join(out)
@@ -0,0 +1,63 @@
+import hashlib
+import re
+from collections import defaultdict
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+
+def simhash(text: str) -> int:
+    # SimHash 64 bit tren cac shingle 3 tu: hai doan gan giong nhau chi khac vai bit
+    tokens = re.findall(r"\w+", text.lower())
+    if len(tokens) >= SHINGLE_SIZE:
+        features = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    else:
+        features = tokens or [text]
+
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class NearDuplicateFilter:
+    """Tim chunk gan trung lap theo khoang cach Hamming giua cac SimHash.
+
+    Fingerprint duoc chia thanh max_distance + 1 band; hai fingerprint lech nhau
+    khong qua max_distance bit chac chan trung nhau o it nhat mot band, nen chi
+    can so sanh voi cac chunk cung bucket thay vi toan bo corpus.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.band_bits = FINGERPRINT_BITS // (max_distance + 1)
+        self.buckets = defaultdict(set)
+        self.fingerprints = {}
+
+    def _keys(self, fp: int):
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.max_distance + 1):
+            yield band, fp >> (band * self.band_bits) & mask
+
+    def find(self, fp: int):
+        for key in self._keys(fp):
+            for cid in self.buckets.get(key, ()):
+                if hamming(fp, self.fingerprints[cid]) <= self.max_distance:
+                    return cid
+        return None
+
+    def add(self, cid: str, fp: int):
+        self.fingerprints[cid] = fp
+        for key in self._keys(fp):
+            self.buckets[key].add(cid)
+
+    def remove(self, cid: str):
+        fp = self.fingerprints.pop(cid, None)
+        if fp is None:
+            return
+        for key in self._keys(fp):
+            self.buckets[key].discard(cid)
@@ -1,37 +1,20 @@
 import base64
+from functools import lru_cache
 
+from src.config import settings
+from src.utils.aliases import AliasMatcher, fold
+
+@lru_cache(maxsize=None)
 def get_base64_image(image_path):
+    # Doc + encode mot lan moi process, khong lap lai o moi lan Streamlit chay lai script
     with open(image_path, "rb") as f:
         return base64.b64encode(f.read()).decode()
 
-def normalize_query(question: str) -> str:
-    q = question.lower()
-
-    NAME_MAP = {
-        "anh hưng": "Nguyễn Gia Hưng",
-        "sư phụ hưng": "Nguyễn Gia Hưng",
-        "anh thiện": "Lữ Hoàn Thiện",
-        "anh vĩ": "Trần Đại Vĩ",
-        "anh long": "Huỳnh Hoàng Long",
-        "anh quy": "Phạm Hoàng Quy",
-        "anh việt": "Bùi Hoàng Việt",
-        "chị thư": "Đặng Thị Minh Thư",
-        "anh huy": "Lý Kiên Huy",
-        "anh đạt": "Nguyễn Đỗ Thành Đạt",
-    }
+@lru_cache(maxsize=1)
+def get_alias_matcher() -> AliasMatcher:
+    return AliasMatcher.from_file(settings.ALIASES_PATH)
 
-    for k, v in NAME_MAP.items():
-        if k in q:
-            q = q.replace(k, v)
-
-    ENTITY_MAP = {
-        "fcaj": "FCAJ",
-        "fcj": "FCAJ",
-        "first cloud journey": "FCAJ",
-        "first cloud ai journey": "FCAJ",
-    }
-    for k, v in ENTITY_MAP.items():
-        if k in q:
-            q = q.replace(k, v)
-
-    return q
+@lru_cache(maxsize=settings.NORMALIZE_CACHE_SIZE)
+def normalize_query(question: str) -> str:
+    # Chu thuong + thay ten/viet tat bang ten chuan (src/config/aliases.json) trong mot lan duyet
+    return get_alias_matcher().replace(fold(question))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Test hang doi cua AdmissionController (src/services/admission.py)
+"""
+
+import pytest
+
+from src.services.admission import AdmissionController
+
+class Aborted(Exception):
+    pass
+
+def test_aborted_queued_request_leaves_queue():
+    controller = AdmissionController(1, 10, 3)
+    controller.acquire()
+
+    # Callback cua request dang xep hang bi ngat, vd Streamlit rerun
+    def on_position(position):
+        raise Aborted()
+
+    with pytest.raises(Aborted):
+        controller.acquire(on_position)
+    assert controller.queue_depth == 0
+
+    controller.release()
+    controller.acquire()
+    assert controller.in_flight == 1
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test streaming cua src/api.py khi client ngat ket noi
+"""
+
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.stub_llm import free_port
+from src import api
+from src.services.admission import AdmissionController
+
+class NotReady:
+    ready = False
+
+def test_stream_disconnect_releases_slot(monkeypatch):
+    controller = AdmissionController(1, 0, 1)
+
+    def stream_answer(question, history):
+        with controller.slot():
+            for i in range(40):
+                time.sleep(0.05)
+                yield f"token{i} "
+
+    monkeypatch.setattr(api, "stream_answer", stream_answer)
+    monkeypatch.setattr(api, "get_warmup", NotReady)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        # Ngat ket noi ngay sau token dau tien
+        with httpx.stream("POST", f"{url}/chat/stream", json={"question": "EKS la gi?"}, timeout=5) as response:
+            assert response.status_code == 200
+            next(response.iter_lines())
+
+        deadline = time.monotonic() + 2
+        while controller.in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert controller.in_flight == 0
+        assert httpx.get(f"{url}/health", timeout=2).status_code == 200
+    finally:
+        server.should_exit = True
+        thread.join(5)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Regression test cho incremental ingest (src/process_docs.py)
+"""
+
+import json
+import os
+
+import pytest
+
+from src.config import settings
+from src.process_docs import process_documents
+from src.services.versions import active_path, current_version
+
+TEXT = "FCAJ workshop EKS. " * 40
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # DATA_PATH/VECTORSTORE_PATH la duong dan tuong doi theo cwd
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "hash")
+    os.makedirs("data/a")
+    os.makedirs("data/b")
+    os.makedirs("data/c")
+    for rel, content in [("a/doc.txt", TEXT), ("b/copy.txt", TEXT), ("c/empty.txt", "")]:
+        with open(os.path.join("data", rel), "w", encoding="utf-8") as f:
+            f.write(content)
+    return tmp_path
+
+def load_files():
+    with open(os.path.join(active_path(), "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+@pytest.mark.parametrize("shard_by", ["none", "folder"])
+def test_remove_files_without_chunks(workdir, monkeypatch, capsys, shard_by):
+    monkeypatch.setattr(settings, "SHARD_BY", shard_by)
+    process_documents(full_rebuild=True, workers=1, dedup=True)
+    files = load_files()
+    assert files["a/doc.txt"]["ids"]
+    assert files["b/copy.txt"]["ids"] == []
+    assert files["c/empty.txt"]["ids"] == []
+
+    # Shard cua file khong co chunk khong co index, khong duoc tao lai toan bo
+    capsys.readouterr()
+    process_documents(workers=1, dedup=True)
+    assert "tao lai toan bo" not in capsys.readouterr().out
+
+    os.remove("data/b/copy.txt")
+    os.remove("data/c/empty.txt")
+    process_documents(workers=1, dedup=True)
+    files = load_files()
+    assert sorted(files) == ["a/doc.txt"]
+    assert "tao lai toan bo" not in capsys.readouterr().out
+    assert not [root for root, _, _ in os.walk("vectorstore") if os.path.basename(root) == ".tmp"]
+
+def test_serving_index_fallback_is_complete(workdir, monkeypatch, capsys):
+    # Shard qua nho de train IVF: dung index flat, lan chay sau khong build + publish lai
+    monkeypatch.setattr(settings, "INDEX_TYPE", "ivf_pq")
+    process_documents(full_rebuild=True, workers=1)
+    version = current_version()
+    capsys.readouterr()
+    process_documents(workers=1)
+    assert "Vectorstore khong thay doi" in capsys.readouterr().out
+    assert current_version() == version